@@ -0,0 +1,46 @@
+"""
+Micro-benchmark of the backend engine dispatch overhead.
+
+Run with
+
+    python benchmarks/bench_engine.py
+"""
+from timeit import repeat
+
+import numpy
+
+from fpm_risk_model.engine import LinAlgEngine, NumpyEngine
+
+NUMBER = 100_000
+REPEAT = 5
+
+
+def _best(stmt, **namespace):
+    return min(repeat(stmt, number=NUMBER, repeat=REPEAT, globals=namespace)) / NUMBER
+
+
+def main():
+    np = NumpyEngine()
+    linalg = LinAlgEngine()
+    x = numpy.random.rand(8)
+    a = numpy.random.rand(4, 4)
+
+    rows = [
+        ("attribute np.mean", "numpy.mean", "np.mean"),
+        ("call np.mean(x)", "numpy.mean(x)", "np.mean(x)"),
+        ("attribute linalg.pinv", "numpy.linalg.pinv", "linalg.pinv"),
+        ("call linalg.pinv(a)", "numpy.linalg.pinv(a)", "linalg.pinv(a)"),
+    ]
+    print(f"{'case':<24}{'numpy (ns)':>12}{'engine (ns)':>14}{'overhead (ns)':>16}")
+    for name, direct, engine in rows:
+        namespace = dict(numpy=numpy, np=np, linalg=linalg, x=x, a=a)
+        direct_time = _best(direct, **namespace) * 1e9
+        engine_time = _best(engine, **namespace) * 1e9
+        print(
+            f"{name:<24}{direct_time:>12.1f}{engine_time:>14.1f}"
+            f"{engine_time - direct_time:>16.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
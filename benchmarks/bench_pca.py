@@ -0,0 +1,56 @@
+"""
+Benchmark of the SVD solvers in the statistical PCA and APCA models.
+
+The returns are simulated from a 10-factor model with T = 500 time
+frames and N = 5000 instruments. The eigenvalue error is measured
+against the "full" solver. The "gram" solver is only supported by
+APCA.
+
+Run with
+
+    python benchmarks/bench_pca.py
+"""
+from timeit import repeat
+
+import numpy
+
+from fpm_risk_model.statistical import APCA, PCA
+
+T = 500
+N = 5000
+K = 10
+SOLVERS = ["full", "arpack", "randomized", "auto"]
+REPEAT = 3
+
+
+def _simulate_returns():
+    rng = numpy.random.default_rng(0)
+    factor_returns = rng.standard_normal((T, K)) * numpy.linspace(0.05, 0.01, K)
+    factor_exposures = rng.standard_normal((K, N))
+    residual_returns = rng.standard_normal((T, N)) * 0.01
+    return factor_returns @ factor_exposures + residual_returns
+
+
+def _eigenvalues(model):
+    # The factor exposures are the components scaled by the singular values
+    return numpy.sort(numpy.linalg.norm(model.factor_exposures, axis=1) ** 2)[::-1]
+
+
+def main():
+    X = _simulate_returns()
+    print(f"{'model':<8}{'solver':<12}{'time (ms)':>12}{'eigenvalue error':>18}")
+    for model_class in [PCA, APCA]:
+        expected = _eigenvalues(model_class(n_components=K, svd_solver="full").fit(X))
+        solvers = SOLVERS + (["gram"] if model_class is APCA else [])
+        for svd_solver in solvers:
+            model = model_class(n_components=K, svd_solver=svd_solver, random_state=0)
+            elapsed = min(repeat(lambda: model.fit(X), number=1, repeat=REPEAT))
+            error = numpy.max(numpy.abs(_eigenvalues(model) / expected - 1.0))
+            print(
+                f"{model_class.__name__:<8}{svd_solver:<12}{elapsed * 1e3:>12.1f}"
+                f"{error:>18.2e}"
+            )
+
+
+if __name__ == "__main__":
+    main()
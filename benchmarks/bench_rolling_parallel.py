@@ -0,0 +1,58 @@
+"""
+Scaling benchmark of the parallel rolling PCA fit.
+
+The rolling fit is run with 1 to 32 workers, capped by the number of
+cores, by both the thread and process executors. The BLAS threads are
+limited to share the cores among the workers.
+
+Run with
+
+    python benchmarks/bench_rolling_parallel.py
+"""
+from multiprocessing import cpu_count
+from time import perf_counter
+
+import numpy
+import pandas
+
+from fpm_risk_model.rolling_factor_risk_model import RollingFactorRiskModel
+from fpm_risk_model.statistical import PCA
+
+T = 1000
+N = 500
+K = 5
+WINDOW = 250
+WORKERS = [1, 2, 4, 8, 16, 32]
+
+
+def _simulate_returns():
+    rng = numpy.random.default_rng(0)
+    factor_returns = rng.standard_normal((T, K)) * numpy.linspace(0.05, 0.02, K)
+    returns = factor_returns @ rng.standard_normal((K, N))
+    returns += rng.standard_normal((T, N)) * 0.01
+    return pandas.DataFrame(returns, index=pandas.bdate_range("2020-01-01", periods=T))
+
+
+def main():
+    X = _simulate_returns()
+    workers_list = [workers for workers in WORKERS if workers <= cpu_count()]
+    print(f"T = {T}, N = {N}, window = {WINDOW}, cores = {cpu_count()}")
+    print(f"{'executor':<10}{'workers':>8}{'time (s)':>10}{'speedup':>10}")
+    for executor in ["thread", "process"]:
+        baseline = None
+        for workers in workers_list:
+            rolling_model = RollingFactorRiskModel(
+                model=PCA(n_components=K), window=WINDOW
+            )
+            start = perf_counter()
+            rolling_model.fit(X, workers=workers, executor=executor)
+            elapsed = perf_counter() - start
+            baseline = baseline or elapsed
+            print(
+                f"{executor:<10}{workers:>8}{elapsed:>10.2f}"
+                f"{baseline / elapsed:>9.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
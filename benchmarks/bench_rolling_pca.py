@@ -0,0 +1,56 @@
+"""
+Benchmark of the rolling PCA fit.
+
+The returns are simulated from a 5-factor model. The rolling fit is
+run window by window, with warm start, and in batches.
+
+Run with
+
+    python benchmarks/bench_rolling_pca.py
+"""
+from time import perf_counter
+
+import numpy
+import pandas
+
+from fpm_risk_model.rolling_factor_risk_model import RollingFactorRiskModel
+from fpm_risk_model.statistical import PCA
+
+T = 500
+N = 300
+K = 5
+WINDOW = 120
+
+
+def _simulate_returns():
+    rng = numpy.random.default_rng(0)
+    factor_returns = rng.standard_normal((T, K)) * numpy.linspace(0.05, 0.02, K)
+    returns = factor_returns @ rng.standard_normal((K, N))
+    returns += rng.standard_normal((T, N)) * 0.01
+    return pandas.DataFrame(returns, index=pandas.bdate_range("2020-01-01", periods=T))
+
+
+def main():
+    X = _simulate_returns()
+    cases = [
+        ("loop", dict(), dict()),
+        ("warm start", dict(warm_start=True), dict()),
+        ("batch", dict(), dict(batch=True)),
+    ]
+    expected = None
+    print(f"{'mode':<12}{'time (s)':>10}{'max cov error':>16}")
+    for name, model_params, fit_params in cases:
+        rolling_model = RollingFactorRiskModel(
+            model=PCA(n_components=K, **model_params), window=WINDOW
+        )
+        start = perf_counter()
+        rolling_model.fit(X, **fit_params)
+        elapsed = perf_counter() - start
+        covs = {key: value.cov().values for key, value in rolling_model.items()}
+        expected = expected or covs
+        error = max(numpy.max(numpy.abs(covs[key] - expected[key])) for key in covs)
+        print(f"{name:<12}{elapsed:>10.2f}{error:>16.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark of the specific variances on a large residual return matrix.
+
+Compare the vectorised reduction against the previous implementation,
+which reduced the (T, N) squared residuals with the Python builtin sum
+over the T rows.
+
+Run with
+
+    python benchmarks/bench_specific_variances.py
+"""
+from timeit import repeat
+
+import numpy
+
+from fpm_risk_model.factor_risk_model import FactorRiskModel
+
+T = 1000
+N = 10000
+HALFLIFE = 63
+NUMBER = 3
+REPEAT = 3
+
+
+def _legacy_specific_variances(residual_returns, weights=None, ddof=1):
+    T = residual_returns.shape[0]
+    if weights is not None:
+        r_mean = numpy.mean(residual_returns * weights[:, numpy.newaxis], axis=0)
+        variances = (residual_returns - r_mean) ** 2
+        variances *= weights[:, numpy.newaxis]
+    else:
+        r_mean = numpy.mean(residual_returns, axis=0)
+        variances = (residual_returns - r_mean) ** 2
+
+    return sum(variances) / (T - ddof)
+
+
+def _best(func):
+    return min(repeat(func, number=NUMBER, repeat=REPEAT)) / NUMBER
+
+
+def main():
+    rng = numpy.random.default_rng(0)
+    residual_returns = rng.standard_normal((T, N)) * 0.01
+    weights = numpy.array([2 ** (-(T - 1 - t) / HALFLIFE) for t in range(0, T)])
+    model = FactorRiskModel(residual_returns=residual_returns)
+
+    print(f"T = {T}, N = {N}")
+    print(f"{'case':<12}{'legacy (ms)':>14}{'vectorised (ms)':>18}{'speedup':>10}")
+    for name, case_weights in [("unweighted", None), ("weighted", weights)]:
+        numpy.testing.assert_allclose(
+            model.specific_variances(weights=case_weights),
+            _legacy_specific_variances(residual_returns, weights=case_weights),
+        )
+        legacy_time = _best(
+            lambda: _legacy_specific_variances(residual_returns, weights=case_weights)
+        )
+        vectorised_time = _best(lambda: model.specific_variances(weights=case_weights))
+        print(
+            f"{name:<12}{legacy_time * 1e3:>14.1f}{vectorised_time * 1e3:>18.1f}"
+            f"{legacy_time / vectorised_time:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
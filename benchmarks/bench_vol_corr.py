@@ -0,0 +1,73 @@
+"""
+Memory benchmark of the volatility and correlation of a factor risk model.
+
+Compare the peak memory of the factor-space volatility and the in-place
+correlation scaling against the previous implementations, which formed
+the dense covariance matrix for the volatility and allocated extra
+(N, N) arrays for the correlation.
+
+Run with
+
+    python benchmarks/bench_vol_corr.py
+"""
+import tracemalloc
+from time import perf_counter
+
+import numpy
+
+from fpm_risk_model.factor_risk_model import FactorRiskModel
+
+T = 500
+N = 5000
+N_FACTORS = 10
+
+
+def _legacy_vol(model):
+    return numpy.sqrt(numpy.diagonal(model.cov()))
+
+
+def _legacy_corr(model):
+    cov = model.cov()
+    vol = numpy.sqrt(numpy.diagonal(cov))
+    return ((cov / vol).T / vol).T
+
+
+def _measure(func, model):
+    model.cov()
+    tracemalloc.start()
+    start = perf_counter()
+    result = func(model)
+    elapsed = perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak, elapsed
+
+
+def main():
+    rng = numpy.random.default_rng(0)
+    model = FactorRiskModel(
+        factor_exposures=rng.standard_normal((N_FACTORS, N)),
+        factor_returns=rng.standard_normal((T, N_FACTORS)) * 0.01,
+        residual_returns=rng.standard_normal((T, N)) * 0.01,
+    )
+
+    print(f"N = {N}, dense (N, N) matrix = {N * N * 8 / 2**20:.0f} MiB")
+    print(
+        f"{'case':<8}{'legacy (MiB)':>14}{'new (MiB)':>12}"
+        f"{'legacy (ms)':>14}{'new (ms)':>11}"
+    )
+    for name, legacy, new in [
+        ("vol", _legacy_vol, FactorRiskModel.vol),
+        ("corr", _legacy_corr, FactorRiskModel.corr),
+    ]:
+        expected, legacy_peak, legacy_time = _measure(legacy, model)
+        result, new_peak, new_time = _measure(new, model)
+        numpy.testing.assert_allclose(result, expected)
+        print(
+            f"{name:<8}{legacy_peak / 2**20:>14.1f}{new_peak / 2**20:>12.1f}"
+            f"{legacy_time * 1e3:>14.1f}{new_time * 1e3:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
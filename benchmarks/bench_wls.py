@@ -0,0 +1,92 @@
+"""
+Benchmark of the weighted least squares executors.
+
+The shapes mimic the tall and skinny systems in the PCA fit and the
+factor risk model transform, i.e. thousands of instruments regressed
+on a few factors. The accuracy is measured against the "lstsq"
+executor.
+
+The batched fit is compared with a Python loop over the stack of
+regressions in a rolling transform, i.e. (window + 1) time frames
+regressed on a few factor returns per date.
+
+Run with
+
+    python benchmarks/bench_wls.py
+"""
+from timeit import repeat
+
+import numpy
+
+from fpm_risk_model.regressor import WLS
+
+EXECUTORS = ["closed", "cholesky", "qr", "lstsq", "auto"]
+SHAPES = [
+    # (m, n, k) for X in (m, n) and y in (m, k)
+    (1000, 5, 250),
+    (5000, 10, 250),
+    (10000, 20, 500),
+]
+BATCH_SHAPES = [
+    # (B, m, n, k) for X in (B, m, n) and y in (B, m, k)
+    (250, 61, 5, 500),
+    (1000, 61, 10, 500),
+]
+REPEAT = 5
+
+
+def main():
+    rng = numpy.random.default_rng(0)
+    print(f"{'shape (m, n, k)':<22}{'executor':<10}{'time (ms)':>12}{'max error':>14}")
+    for m, n, k in SHAPES:
+        X = rng.standard_normal((m, n))
+        y = X @ rng.standard_normal((n, k)) + rng.standard_normal((m, k))
+        weights = rng.uniform(0.5, 1.5, m)
+        expected = WLS(executor="lstsq").fit(X=X, y=y, weights=weights).beta
+        for executor in EXECUTORS:
+            regressor = WLS(executor=executor)
+            elapsed = min(
+                repeat(
+                    lambda: regressor.fit(X=X, y=y, weights=weights),
+                    number=1,
+                    repeat=REPEAT,
+                )
+            )
+            error = numpy.max(
+                numpy.abs(regressor.fit(X=X, y=y, weights=weights).beta - expected)
+            )
+            print(
+                f"{str((m, n, k)):<22}{executor:<10}{elapsed * 1e3:>12.2f}"
+                f"{error:>14.2e}"
+            )
+
+
+def main_batch():
+    rng = numpy.random.default_rng(0)
+    print(
+        f"{'shape (B, m, n, k)':<24}{'executor':<10}{'loop (ms)':>12}{'batch (ms)':>12}"
+    )
+    for B, m, n, k in BATCH_SHAPES:
+        X = rng.standard_normal((B, m, n))
+        y = X @ rng.standard_normal((B, n, k)) + rng.standard_normal((B, m, k))
+        for executor in ["closed", "cholesky", "auto"]:
+            regressor = WLS(executor=executor)
+            loop_elapsed = min(
+                repeat(
+                    lambda: [regressor.fit(X=X[i], y=y[i]) for i in range(B)],
+                    number=1,
+                    repeat=REPEAT,
+                )
+            )
+            batch_elapsed = min(
+                repeat(lambda: regressor.fit_batch(X=X, y=y), number=1, repeat=REPEAT)
+            )
+            print(
+                f"{str((B, m, n, k)):<24}{executor:<10}{loop_elapsed * 1e3:>12.2f}"
+                f"{batch_elapsed * 1e3:>12.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
+    main_batch()
@@ -2,5 +2,7 @@ __version__ = "2024.0.0"
 
 # flake8: noqa
 from .cov_estimator import CovarianceEstimator, RollingCovarianceEstimator
+from .cov_operator import FactorCovarianceOperator
 from .factor_risk_model import FactorRiskModel
+from .factor_risk_model_summary import FactorRiskModelSummary
 from .rolling_factor_risk_model import RollingFactorRiskModel
@@ -3,7 +3,9 @@ from typing import Any, Dict, Optional, Union
 from numpy import nan, sqrt, sum
 from pandas import DataFrame, Series
 
+from ..factor_risk_model import FactorRiskModel
 from ..rolling_factor_risk_model import RollingFactorRiskModel
+from .utils import validate_cov_halflife
 
 
 def compute_standardized_returns(
@@ -42,6 +44,8 @@ def compute_standardized_returns(
         A timeseries of standardized returns.
     """
     b_t = Series(nan, index=weights.index)
+    if forecast_vols is None:
+        validate_cov_halflife(rolling_risk_model, cov_halflife)
     instruments = weights.columns
     for index, index_weights in weights.iterrows():
         returns = sum(X.loc[index, instruments] * index_weights)
@@ -51,12 +55,18 @@ def compute_standardized_returns(
             risk_model = rolling_risk_model.get(index)
             if risk_model is None:
                 continue
-            elif isinstance(risk_model, DataFrame):
-                cov = risk_model
+            elif isinstance(risk_model, FactorRiskModel):
+                vol = sqrt(
+                    risk_model.portfolio_variance(index_weights, halflife=cov_halflife)
+                )
             else:
-                cov = risk_model.cov(halflife=cov_halflife)
-            cov = cov.reindex(index=instruments, columns=instruments).fillna(0.0).values
-            vol = sqrt((cov @ index_weights) @ index_weights)
+                if isinstance(risk_model, DataFrame):
+                    cov = risk_model
+                else:
+                    cov = risk_model.cov(halflife=cov_halflife)
+                cov = cov.reindex(index=instruments, columns=instruments)
+                cov = cov.fillna(0.0).values
+                vol = sqrt((cov @ index_weights) @ index_weights)
         b_t[index] = returns / vol
 
     return b_t
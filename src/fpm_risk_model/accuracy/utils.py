@@ -0,0 +1,41 @@
+from typing import Any, Dict, Optional, Union
+
+from ..factor_risk_model_summary import FactorRiskModelSummary
+from ..rolling_factor_risk_model import RollingFactorRiskModel
+
+
+def validate_cov_halflife(
+    rolling_risk_model: Optional[Union[RollingFactorRiskModel, Dict[Any, Any]]],
+    cov_halflife: Optional[float],
+):
+    """
+    Validate the covariance halflife against the summarized risk models.
+
+    A summary only keeps the covariance components of its own halflife
+    and degrees of freedom, and the risk models of a rolling risk model
+    are summarized alike, so the first risk model is checked before
+    computing the covariances of all the dates.
+
+    Parameters
+    ----------
+    rolling_risk_model: Union[RollingFactorRiskModel, Dict[Any, Any]]
+        A rolling risk model object or dictionary of covariances of
+        which the keys and values are dates and covariances.
+    cov_halflife: Optional[float]
+        Halflife in computing covariances.
+    """
+    if rolling_risk_model is None:
+        return
+
+    risk_model = next(iter(rolling_risk_model.values()), None)
+    if not isinstance(risk_model, FactorRiskModelSummary):
+        return
+
+    if risk_model.halflife != cov_halflife or risk_model.ddof != 1:
+        raise ValueError(
+            "The risk models are summarized with halflife "
+            f"({risk_model.halflife}) and ddof ({risk_model.ddof}), which "
+            f"cannot compute the covariances with cov_halflife ({cov_halflife}) "
+            "and ddof (1). Pass the cov_halflife of the summaries, or retain "
+            "the full risk models."
+        )
@@ -4,7 +4,9 @@ from numpy import nan, ndarray, sqrt, sum
 from pandas import DataFrame, Series
 from scipy.stats import norm
 
+from ..factor_risk_model import FactorRiskModel
 from ..rolling_factor_risk_model import RollingFactorRiskModel
+from .utils import validate_cov_halflife
 
 
 def compute_value_at_risk_threshold(
@@ -43,19 +45,25 @@ def compute_value_at_risk_threshold(
         raise ValueError(f"Threshold {threshold} should be between 0 and 1")
     quantile = norm.ppf(threshold)
     value_at_risk = Series(nan, index=weights.index)
+    validate_cov_halflife(rolling_risk_model, cov_halflife)
     instruments = weights.columns
     for index, index_weights in weights.iterrows():
         if rolling_risk_model is not None:
             risk_model = rolling_risk_model.get(index)
             if risk_model is None:
                 continue
-            elif isinstance(risk_model, DataFrame):
-                cov = risk_model
+            elif isinstance(risk_model, FactorRiskModel):
+                vol = sqrt(
+                    risk_model.portfolio_variance(index_weights, halflife=cov_halflife)
+                )
             else:
-                cov = risk_model.cov(halflife=cov_halflife)
-
-            cov = cov.reindex(index=instruments, columns=instruments).fillna(0.0).values
-            vol = sqrt((cov @ index_weights) @ index_weights)
+                if isinstance(risk_model, DataFrame):
+                    cov = risk_model
+                else:
+                    cov = risk_model.cov(halflife=cov_halflife)
+                cov = cov.reindex(index=instruments, columns=instruments)
+                cov = cov.fillna(0.0).values
+                vol = sqrt((cov @ index_weights) @ index_weights)
         else:
             vol = forecast_vols[index]
         value_at_risk[index] = quantile * vol
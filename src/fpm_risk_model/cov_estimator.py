@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 
 from numpy import diag_indices_from, trace
 from pandas import DataFrame, Series, Timestamp
@@ -41,7 +41,10 @@ class CovarianceEstimator:
         return self._risk_model.corr()
 
     def cov(
-        self, volatility: Optional[Series] = None, strict: bool = True
+        self,
+        volatility: Optional[Series] = None,
+        strict: bool = True,
+        instruments: Optional[List] = None,
     ) -> DataFrame:
         """
         Correlation
@@ -53,11 +56,20 @@ class CovarianceEstimator:
         strict : bool
           Indicates to throw exception if volatility series does not align with
           correlation matrix.
+        instruments : Optional[List]
+          Instruments of the sub-universe. If provided, only the covariance
+          of the sub-universe is computed by the risk model. Optional.
         """
+        params = {}
+        if instruments is not None:
+            params["instruments"] = instruments
+            if volatility is not None:
+                volatility = volatility[volatility.index.isin(instruments)]
+
         if volatility is None:
-            return self._risk_model.cov()
+            return self._risk_model.cov(**params)
 
-        corr = self._risk_model.corr()
+        corr = self._risk_model.corr(**params)
         if strict and set(volatility.index) != set(corr.index):
             raise ValueError(
                 "Incorrect volatility series passed. Length of volatility "
@@ -0,0 +1,311 @@
+from typing import Optional, Sequence, Union
+
+from numpy import diag_indices_from, nan, ndarray
+from pandas import DataFrame, Index, Series
+
+from .engine import LinAlgEngine, NumpyEngine
+
+np = NumpyEngine()
+linalg = LinAlgEngine()
+
+
+class FactorCovarianceOperator:
+    """
+    Factor covariance operator.
+
+    The operator represents the covariance matrix of a factor risk
+    model in the structured low-rank plus diagonal form
+
+    .. math::
+        \\Sigma = B^T \\Sigma_F B + D
+
+    where B is the factor exposures in dimension (n, N), Sigma_F is
+    the factor covariance matrix in dimension (n, n) and D is the
+    diagonal matrix of specific variances. The dense (N, N) matrix is
+    never formed unless `to_dense` is called, so that the risk queries
+    cost O(N n) in time and memory.
+
+    The inverse of the covariance matrix has the same structure by the
+    Woodbury identity, so it is represented by the same operator.
+    """
+
+    def __init__(
+        self,
+        factor_exposures: ndarray,
+        factor_covariances: ndarray,
+        specific_variances: ndarray,
+        instruments: Optional[Index] = None,
+    ):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        factor_exposures : ndarray
+          Factor exposures in dimension (n, N).
+        factor_covariances : ndarray
+          Factor covariance matrix in dimension (n, n).
+        specific_variances : ndarray
+          Specific variances in dimension (N,).
+        instruments : Optional[Index]
+          Instruments of the covariance matrix. If provided, the
+          outputs are converted into pandas objects.
+        """
+        self._factor_exposures = factor_exposures
+        self._factor_covariances = factor_covariances
+        self._specific_variances = specific_variances
+        self._instruments = instruments
+
+    @property
+    def factor_exposures(self) -> ndarray:
+        """
+        Return the factor exposures in dimension (n, N).
+        """
+        return self._factor_exposures
+
+    @property
+    def factor_covariances(self) -> ndarray:
+        """
+        Return the factor covariance matrix in dimension (n, n).
+        """
+        return self._factor_covariances
+
+    @property
+    def specific_variances(self) -> ndarray:
+        """
+        Return the specific variances in dimension (N,).
+        """
+        return self._specific_variances
+
+    @property
+    def instruments(self) -> Optional[Index]:
+        """
+        Return the instruments.
+        """
+        return self._instruments
+
+    @property
+    def shape(self):
+        """
+        Return the shape of the covariance matrix.
+        """
+        N = self._specific_variances.shape[0]
+        return (N, N)
+
+    def matvec(self, x: Union[ndarray, Series, DataFrame]) -> ndarray:
+        """
+        Multiply the covariance matrix by the vectors.
+
+        Parameters
+        ----------
+        x : Union[ndarray, Series, DataFrame]
+          Vector in dimension (N,) or matrix in dimension (N, P).
+
+        Returns
+        -------
+        ndarray
+          The product of the covariance matrix and x, in the same
+          dimension as x.
+        """
+        values = self._to_values(x)
+        B = self._factor_exposures
+        D = self._specific_variances
+        if len(values.shape) == 1:
+            product = B.T @ (self._factor_covariances @ (B @ values)) + D * values
+        else:
+            product = (
+                B.T @ (self._factor_covariances @ (B @ values))
+                + D[:, np.newaxis] * values
+            )
+
+        if isinstance(x, DataFrame):
+            index = x.index if self._instruments is None else self._instruments
+            return DataFrame(product, index=index, columns=x.columns)
+        elif isinstance(x, Series):
+            index = x.index if self._instruments is None else self._instruments
+            return Series(product, index=index)
+        return product
+
+    def quad_form(self, w: Union[ndarray, Series, DataFrame]) -> ndarray:
+        """
+        Compute the quadratic form w^T Sigma w.
+
+        Parameters
+        ----------
+        w : Union[ndarray, Series, DataFrame]
+          Weights in dimension (N,), or P portfolios in dimension
+          (P, N).
+
+        Returns
+        -------
+        ndarray
+          The variance of the portfolio, or the variances of the P
+          portfolios in dimension (P,).
+        """
+        values = self._to_values(w, axis=-1)
+        exposures = values @ self._factor_exposures.T
+        variances = np.sum(
+            (exposures @ self._factor_covariances) * exposures, axis=-1
+        ) + np.sum(values * values * self._specific_variances, axis=-1)
+
+        if isinstance(w, DataFrame):
+            return Series(variances, index=w.index)
+        return variances
+
+    def diag(self) -> ndarray:
+        """
+        Return the diagonal of the covariance matrix, i.e. the variances.
+
+        Returns
+        -------
+        ndarray
+          Variances in dimension (N,), or a Series indexed by the
+          instruments if provided.
+        """
+        B = self._factor_exposures
+        variances = (
+            np.sum(B * (self._factor_covariances @ B), axis=0)
+            + self._specific_variances
+        )
+        if self._instruments is not None:
+            return Series(variances, index=self._instruments)
+        return variances
+
+    def solve(self, x: Union[ndarray, Series, DataFrame]) -> ndarray:
+        """
+        Solve the linear system Sigma z = x.
+
+        Parameters
+        ----------
+        x : Union[ndarray, Series, DataFrame]
+          Right hand side in dimension (N,), or P right hand sides in
+          dimension (N, P).
+
+        Returns
+        -------
+        ndarray
+          The solution z in the same dimension as x.
+        """
+        return self.inv().matvec(x)
+
+    def inv(self) -> "FactorCovarianceOperator":
+        """
+        Return the operator of the inverse covariance matrix.
+
+        By the Woodbury identity, the inverse is
+
+        .. math::
+            \\Sigma^{-1} = D^{-1} - D^{-1} B^T (I + \\Sigma_F B D^{-1} B^T)^{-1}
+                \\Sigma_F B D^{-1}
+
+        which only solves an (n, n) system, so that it costs O(N n^2)
+        instead of O(N^3). The factor covariance matrix is not required
+        to be invertible.
+
+        Returns
+        -------
+        FactorCovarianceOperator
+          The operator of the inverse covariance matrix.
+        """
+        B = self._factor_exposures
+        D = self._specific_variances
+        if not bool(np.all(D > 0.0)):
+            raise ValueError(
+                "Specific variances must be positive to invert the covariance matrix"
+            )
+
+        D_inv = 1.0 / D
+        U = B * D_inv
+        n = self._factor_covariances.shape[0]
+        capacitance = np.eye(n) + self._factor_covariances @ (U @ B.T)
+        C = linalg.solve(capacitance, self._factor_covariances)
+        # C is symmetric in exact arithmetic
+        C = (C + C.T) / 2.0
+        return FactorCovarianceOperator(
+            factor_exposures=U,
+            factor_covariances=-C,
+            specific_variances=D_inv,
+            instruments=self._instruments,
+        )
+
+    def submatrix(
+        self, instruments: Union[Sequence, ndarray, Index]
+    ) -> "FactorCovarianceOperator":
+        """
+        Return the operator of the covariance submatrix.
+
+        Parameters
+        ----------
+        instruments : Union[Sequence, ndarray, Index]
+          Instruments of the submatrix. If the operator has the
+          instruments, they are the instrument labels. Otherwise, they
+          are the integer positions.
+
+        Returns
+        -------
+        FactorCovarianceOperator
+          The operator of the covariance submatrix.
+        """
+        if self._instruments is not None:
+            positions = self._instruments.get_indexer(instruments)
+            if bool(np.any(positions < 0)):
+                missing = Index(instruments)[positions < 0]
+                raise KeyError(f"Instruments {list(missing)} are not found")
+            sub_instruments = self._instruments[positions]
+        else:
+            positions = np.asarray(instruments)
+            sub_instruments = None
+
+        return FactorCovarianceOperator(
+            factor_exposures=self._factor_exposures[:, positions],
+            factor_covariances=self._factor_covariances,
+            specific_variances=self._specific_variances[positions],
+            instruments=sub_instruments,
+        )
+
+    def to_dense(self) -> Union[ndarray, DataFrame]:
+        """
+        Return the dense covariance matrix.
+
+        The instruments with zero covariances are set to nan, same as
+        the covariance matrix of the factor risk model.
+
+        Returns
+        -------
+        Union[ndarray, DataFrame]
+          A square pairwise covariance matrix which its diagonal
+          entries are the variances.
+        """
+        B = self._factor_exposures
+        cov = B.T @ self._factor_covariances @ B
+        cov[diag_indices_from(cov)] += self._specific_variances
+
+        # Set zero covariance instruments to nan
+        valid_instruments = np.any(cov != 0.0, axis=0)
+        cov[~valid_instruments, :] = nan
+        cov[:, ~valid_instruments] = nan
+
+        if self._instruments is not None:
+            return DataFrame(cov, index=self._instruments, columns=self._instruments)
+        return cov
+
+    def _to_values(self, x: Union[ndarray, Series, DataFrame], axis: int = 0):
+        """
+        Convert the input into an array aligned with the instruments.
+
+        Only the instruments missing in the input are filled with zeros,
+        so that the nan values in the input are propagated to the
+        outputs rather than hidden.
+        """
+        if isinstance(x, Series):
+            if self._instruments is not None:
+                x = x.reindex(self._instruments, fill_value=0.0)
+            return x.values
+        elif isinstance(x, DataFrame):
+            if self._instruments is not None:
+                if axis == 0:
+                    x = x.reindex(index=self._instruments, fill_value=0.0)
+                else:
+                    x = x.reindex(columns=self._instruments, fill_value=0.0)
+            return x.values
+        return x
@@ -1,20 +1,49 @@
 from contextlib import contextmanager
+from contextvars import ContextVar
 from os import environ
-from typing import Any
+from typing import Any, Dict, Optional
 
+# Global backend engine, used when no backend is selected in the context
 _BACKEND_ENGINE = "numpy"
+# Backend engine selected in the current context (thread / asyncio task)
+_CONTEXT_BACKEND_ENGINE: ContextVar[Optional[str]] = ContextVar(
+    "fpm_backend_engine", default=None
+)
 _SUPPORTED_ENGINES = ["numpy", "tensorflow", "cupy", "jax", "torch", "dask"]
 
+# Resolved backend modules keyed by the backend engine name
+_NUMPY_MODULES: Dict[str, Any] = {}
+_LINALG_MODULES: Dict[str, Any] = {}
+
 
 def backend():
-    return _BACKEND_ENGINE
+    """
+    Return the backend engine.
+
+    The backend engine selected by `use_backend` in the current
+    context takes precedence over the global one.
+    """
+    return _CONTEXT_BACKEND_ENGINE.get() or _BACKEND_ENGINE
+
+
+def clear_cache():
+    """
+    Clear the cache of the resolved backend modules.
+
+    The backend modules are resolved again in the next attribute
+    access of the NumPy and linear algebra engines.
+    """
+    _NUMPY_MODULES.clear()
+    _LINALG_MODULES.clear()
 
 
 def set_backend(library_name):
     """
     Set backend engine.
 
-    The function sets the backend engine in global level.
+    The function sets the backend engine in global level. The backend
+    engine selected by `use_backend` in the current context still takes
+    precedence over the global one.
 
     Parameters
     ----------
@@ -30,6 +59,7 @@ def set_backend(library_name):
         )
     global _BACKEND_ENGINE
     _BACKEND_ENGINE = library_name
+    clear_cache()
     return _BACKEND_ENGINE
 
 
@@ -41,6 +71,11 @@ def use_backend(library_name="numpy"):
     The function is a context manager to enable users to switch to a
     specific library as a replacement of NumPy in CPU.
 
+    The selection is stored in a context variable, so each thread or
+    asyncio task can use its own backend engine concurrently without
+    affecting the global one. The module cache is keyed by the backend
+    engine and shared across threads, so it is not cleared on switching.
+
     Parameters
     ----------
     library_name : str
@@ -53,107 +88,137 @@ def use_backend(library_name="numpy"):
             "Only `numpy`, `tensorflow`, `cupy`, `jax`, `torch` and `dask` "
             f"are supported, but not {library_name}"
         )
-    global _BACKEND_ENGINE
-    _original = _BACKEND_ENGINE
+    token = _CONTEXT_BACKEND_ENGINE.set(library_name)
     try:
-        _BACKEND_ENGINE = library_name
         yield
     finally:
-        _BACKEND_ENGINE = _original
+        _CONTEXT_BACKEND_ENGINE.reset(token)
+
+
+def _import_numpy(library_name: str) -> Any:
+    """
+    Import the NumPy-compatible module of the backend engine.
+    """
+    try:
+        if library_name == "numpy":
+            import numpy as anp
+        elif library_name == "tensorflow":
+            import tensorflow.experimental.numpy as anp
+
+            anp.experimental_enable_numpy_behavior()
+        elif library_name == "cupy":
+            import cupy as anp
+        elif library_name == "jax":
+            import jax.numpy as anp
+        elif library_name == "torch":
+            import torch as anp
+
+            anp.array = anp.tensor
+            anp.ndarray = anp.Tensor
+            anp.newaxis = None
+        elif library_name == "dask":
+            import dask.array as anp
+            from numpy import newaxis
+
+            anp.newaxis = newaxis
+        else:
+            raise ValueError(f"Cannot recognize backend {library_name}")
+    except ImportError:
+        raise ImportError(
+            "Library `numpy` cannot be imported from backend engine "
+            f"{library_name}. Please make sure to install the library "
+            f"via `pip install {library_name}`."
+        )
+
+    return anp
+
+
+def _import_linalg(library_name: str) -> Any:
+    """
+    Import the linear algebra module of the backend engine.
+    """
+    try:
+        if library_name == "numpy":
+            import numpy.linalg as alinalg
+        elif library_name == "tensorflow":
+            import tensorflow.experimental.numpy as anp
+            import tensorflow.linalg as alinalg
+
+            anp.experimental_enable_numpy_behavior()
+        elif library_name == "cupy":
+            import cupy.linalg as alinalg
+        elif library_name == "jax":
+            import jax.numpy.linalg as alinalg
+        elif library_name == "torch":
+            import torch.linalg as alinalg
+        elif library_name == "dask":
+            import dask.array.linalg as alinalg
+
+            # XXX: fall back pinv to inv
+            alinalg.pinv = alinalg.inv
+        else:
+            raise ValueError(f"Cannot recognize backend {library_name}")
+    except ImportError:
+        raise ImportError(
+            "Library `linalg` cannot be imported from backend engine "
+            f"{library_name}. Please make sure to install the library "
+            f"via `pip install {library_name}`."
+        )
+
+    return alinalg
 
 
 class NumpyEngine:
     """
     NumPy engine.
+
+    The resolved backend module is cached per backend engine, so
+    the attribute access does not import the library again.
     """
 
     def __getattribute__(self, __name: str) -> Any:
+        library_name = _CONTEXT_BACKEND_ENGINE.get() or _BACKEND_ENGINE
         if __name == "name":
-            return _BACKEND_ENGINE
+            return library_name
 
         try:
-            if _BACKEND_ENGINE == "numpy":
-                import numpy as anp
-            elif _BACKEND_ENGINE == "tensorflow":
-                import tensorflow.experimental.numpy as anp
-
-                anp.experimental_enable_numpy_behavior()
-            elif _BACKEND_ENGINE == "cupy":
-                import cupy as anp
-            elif _BACKEND_ENGINE == "jax":
-                import jax.numpy as anp
-            elif _BACKEND_ENGINE == "torch":
-                import torch as anp
-
-                anp.array = anp.tensor
-                anp.ndarray = anp.Tensor
-                anp.newaxis = None
-            elif _BACKEND_ENGINE == "dask":
-                import dask.array as anp
-                from numpy import newaxis
-
-                anp.newaxis = newaxis
-            else:
-                raise ValueError(f"Cannot recognize backend {_BACKEND_ENGINE}")
-        except ImportError:
-            raise ImportError(
-                "Library `numpy` cannot be imported from backend engine "
-                f"{_BACKEND_ENGINE}. Please make sure to install the library "
-                f"via `pip install {_BACKEND_ENGINE}`."
-            )
+            anp = _NUMPY_MODULES[library_name]
+        except KeyError:
+            anp = _NUMPY_MODULES[library_name] = _import_numpy(library_name)
 
         try:
             return getattr(anp, __name)
         except AttributeError:
             raise AttributeError(
                 f"Cannot get attribute / function ({__name}) from numpy library in "
-                f"backend engine {_BACKEND_ENGINE}"
+                f"backend engine {library_name}"
             )
 
 
 class LinAlgEngine:
     """
     Linear algebra engine.
+
+    The resolved backend module is cached per backend engine, so
+    the attribute access does not import the library again.
     """
 
     def __getattribute__(self, __name: str) -> Any:
+        library_name = _CONTEXT_BACKEND_ENGINE.get() or _BACKEND_ENGINE
         if __name == "name":
-            return _BACKEND_ENGINE
+            return library_name
 
         try:
-            if _BACKEND_ENGINE == "numpy":
-                import numpy.linalg as alinalg
-            elif _BACKEND_ENGINE == "tensorflow":
-                import tensorflow.experimental.numpy as anp
-                import tensorflow.linalg as alinalg
-
-                anp.experimental_enable_numpy_behavior()
-            elif _BACKEND_ENGINE == "cupy":
-                import cupy.linalg as alinalg
-            elif _BACKEND_ENGINE == "jax":
-                import jax.numpy.linalg as alinalg
-            elif _BACKEND_ENGINE == "torch":
-                import torch.linalg as alinalg
-            elif _BACKEND_ENGINE == "dask":
-                import dask.array.linalg as alinalg
-
-                # XXX: fall back pinv to inv
-                alinalg.pinv = alinalg.inv
-            else:
-                raise ValueError(f"Cannot recognize backend {_BACKEND_ENGINE}")
-        except ImportError:
-            raise ImportError(
-                "Library `linalg` cannot be imported from backend engine "
-                f"{_BACKEND_ENGINE}. Please make sure to install the library "
-                f"via `pip install {_BACKEND_ENGINE}`."
-            )
+            alinalg = _LINALG_MODULES[library_name]
+        except KeyError:
+            alinalg = _LINALG_MODULES[library_name] = _import_linalg(library_name)
 
         try:
             return getattr(alinalg, __name)
         except AttributeError:
             raise AttributeError(
                 f"Cannot get attribute / function ({__name}) from linalg library in "
-                f"backend engine {_BACKEND_ENGINE}"
+                f"backend engine {library_name}"
             )
 
 
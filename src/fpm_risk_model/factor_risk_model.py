@@ -1,17 +1,34 @@
 import json
+from collections import OrderedDict
 from os.path import join
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple, Union
 
-from numpy import any, diag_indices_from, nan, ndarray
-from pandas import DataFrame, Series
+from numpy import any, array_equal, diag_indices_from, nan, ndarray
+from pandas import DataFrame, Index, Series
 
+from .cov_operator import FactorCovarianceOperator
 from .engine import NumpyEngine
 from .regressor import WLS
-from .risk_model import RiskModel
+from .risk_model import RiskModel, RiskModelConfig
 
 np = NumpyEngine()
 
 
+class FactorRiskModelConfig(RiskModelConfig):
+    """
+    Factor risk model configuration.
+
+    Parameters
+    ----------
+    cov_cache_size : int
+        Maximum number of the factor covariance matrices and specific
+        variances cached per (halflife, ddof). Default is 8. If 0, the
+        cache is disabled.
+    """
+
+    cov_cache_size: int = 8
+
+
 class FactorRiskModel(RiskModel):
     """
     Factor Risk Model.
@@ -31,6 +48,8 @@ class FactorRiskModel(RiskModel):
     regarding the specified factor exposures and returns.
     """
 
+    ConfigClass = FactorRiskModelConfig
+
     def __init__(
         self,
         factor_exposures: ndarray = None,
@@ -54,6 +73,11 @@ class FactorRiskModel(RiskModel):
         self._factor_exposures = factor_exposures
         self._factor_returns = factor_returns
         self._residual_returns = residual_returns
+        # Cache of the factor projection operator in the transform
+        self._projection_cache = None
+        # Cache of the covariance components keyed on (halflife, ddof)
+        self._cov_cache = OrderedDict()
+        self._cov_cache_data = None
 
     @property
     def factor_exposures(self) -> ndarray:
@@ -119,26 +143,43 @@ class FactorRiskModel(RiskModel):
         object
           Copy of the model.
         """
-        return FactorRiskModel(
+        model = FactorRiskModel(
             factor_exposures=self._factor_exposures.copy(),
             factor_returns=self._factor_returns.copy(),
             residual_returns=self._residual_returns.copy(),
             **self._config.dict(),
         )
+        # The cached projection operator is never modified in place
+        model._projection_cache = self._projection_cache
+        return model
 
     def specific_variances(self, weights=None, ddof=1) -> ndarray:
         """
         Get specific variances.
 
+        The variances are reduced from the sums of the (weighted)
+        squares and the means of the residual returns, instead of
+        demeaning the residual returns first. The stacked weights share
+        one array of the squared residual returns in dimension (T, N).
+        The single pass formula loses precision by cancellation if the
+        means of the residual returns are large against their standard
+        deviations, and the rounding errors below zero are clipped.
+
         Parameters
         ----------
+        weights : Optional[ndarray]
+          Weights of the time frames in dimension (T,). If None, the
+          time frames are equally weighted. The weights can also be
+          stacked in dimension (H, T) to compute H sets of variances
+          in one pass.
         ddof : int
           Degrees of freedom.
 
         Returns
         -------
         ndarray
-          Specific variances of the instruments.
+          Specific variances of the instruments in dimension (N,), or
+          (H, N) if the weights are stacked.
         """
         T = self._residual_returns.shape[0]
         residual_returns = self._residual_returns
@@ -146,21 +187,107 @@ class FactorRiskModel(RiskModel):
             residual_returns = residual_returns.values
 
         if weights is not None:
-            r_mean = np.mean(residual_returns * weights[:, np.newaxis], axis=0)
-            variances = (residual_returns - r_mean) ** 2
-            variances *= weights[:, np.newaxis]
+            # sum_t w_t (r_t - m)^2 = sum_t w_t r_t^2 - 2 m sum_t w_t r_t
+            #   + m^2 sum_t w_t, where m = sum_t w_t r_t / T
+            weighted_sum = weights @ residual_returns
+            r_mean = weighted_sum / T
+            if len(weights.shape) == 1:
+                sum_squares = np.einsum(
+                    "t,tn,tn->n", weights, residual_returns, residual_returns
+                )
+            else:
+                # Share the squared residual returns across the weights
+                sum_squares = weights @ (residual_returns * residual_returns)
+            variances = (
+                sum_squares
+                - 2.0 * r_mean * weighted_sum
+                + np.sum(weights, axis=-1)[..., np.newaxis] * r_mean**2
+            )
         else:
             r_mean = np.mean(residual_returns, axis=0)
-            variances = (residual_returns - r_mean) ** 2
+            variances = (
+                np.einsum("tn,tn->n", residual_returns, residual_returns)
+                - T * r_mean**2
+            )
 
-        variances = sum(variances) / (T - ddof)
+        # Clip the rounding errors of the zero variances
+        variances = np.maximum(variances, 0.0) / (T - ddof)
 
         if isinstance(self._residual_returns, DataFrame):
-            variances = Series(variances, index=self._residual_returns.columns)
+            if len(variances.shape) == 1:
+                variances = Series(variances, index=self._residual_returns.columns)
+            else:
+                variances = DataFrame(variances, columns=self._residual_returns.columns)
 
         return variances
 
-    def transform(self, y: ndarray, regressor: Optional[object] = None) -> object:
+    def projection(
+        self, regressor: Optional[WLS] = None, weights: Optional[ndarray] = None
+    ) -> ndarray:
+        """
+        Return the factor projection operator.
+
+        The projection operator P maps the instrument returns y onto
+        the factor exposures, i.e. factor_exposures = P @ y. It is
+        computed from the factor returns once and cached, keyed on the
+        factor returns, the weights and the regressor executor. The
+        cache is invalidated when any of them changes.
+
+        Parameters
+        ----------
+        regressor : WLS, default=None
+            Regressor to compute the projection operator. If None, the
+            regressor is set to the default WLS.
+
+        weights : Optional[ndarray]
+            Weights of the time frames in the regression, in dimension
+            (T,) where T is the number of time frames.
+
+        Returns
+        -------
+        ndarray
+            Projection operator in dimension (n, T) where n is the
+            number of factors and T is the number of time frames.
+        """
+        X = self.factor_returns
+        if X is None:
+            raise ValueError("Factor returns must be initialised first")
+
+        if isinstance(X, DataFrame):
+            X = X.values
+
+        regressor = regressor or WLS()
+        cache = self._projection_cache
+        if (
+            cache is not None
+            and cache["executor"] == regressor.executor
+            and array_equal(cache["factor_returns"], X)
+            and (
+                (cache["weights"] is None and weights is None)
+                or (
+                    cache["weights"] is not None
+                    and weights is not None
+                    and array_equal(cache["weights"], weights)
+                )
+            )
+        ):
+            return cache["projection"]
+
+        projection = regressor.projection(X=X, weights=weights)
+        self._projection_cache = {
+            "executor": regressor.executor,
+            "factor_returns": X.copy(),
+            "weights": None if weights is None else weights.copy(),
+            "projection": projection,
+        }
+        return projection
+
+    def transform(
+        self,
+        y: ndarray,
+        regressor: Optional[object] = None,
+        weights: Optional[ndarray] = None,
+    ) -> object:
         """
         Transform the factor risk model.
 
@@ -169,6 +296,10 @@ class FactorRiskModel(RiskModel):
         factor risk model is fitted by the estimation universe,
         and then transformed by the model universe.
 
+        If the regressor is a plain WLS, the factor projection
+        operator is cached and reused across the transforms against
+        the same factor returns.
+
         Parameters
         ----------
         y : ndarray
@@ -178,6 +309,10 @@ class FactorRiskModel(RiskModel):
             Regressor to transform the input y into factor exposures.
             If None, the regressor is set to the default WLS.
 
+        weights : Optional[ndarray]
+            Weights of the time frames in the regression, in dimension
+            (T,) where T is the number of time frames.
+
         Returns
         -------
         ndarray
@@ -198,10 +333,29 @@ class FactorRiskModel(RiskModel):
         regressor = regressor or WLS()
 
         # Transform the factor exposures from the y input
-        regressor_result = regressor.fit(X=X, y=y_input)
-        factor_exposures = regressor_result.beta
-        residual_returns = regressor_result.alpha
+        if type(regressor) is WLS:
+            factor_exposures = (
+                self.projection(regressor=regressor, weights=weights) @ y_input
+            )
+            residual_returns = y_input - X @ factor_exposures
+        else:
+            params = {}
+            if weights is not None:
+                params["weights"] = weights
+            regressor_result = regressor.fit(X=X, y=y_input, **params)
+            factor_exposures = regressor_result.beta
+            residual_returns = regressor_result.alpha
+
+        return self._set_transform_result(
+            y=y, factor_exposures=factor_exposures, residual_returns=residual_returns
+        )
 
+    def _set_transform_result(
+        self, y: ndarray, factor_exposures: ndarray, residual_returns: ndarray
+    ) -> object:
+        """
+        Set the factor exposures and residual returns of the transform.
+        """
         if isinstance(self.factor_returns, DataFrame):
             factor_exposures = DataFrame(
                 factor_exposures,
@@ -216,11 +370,62 @@ class FactorRiskModel(RiskModel):
 
         self._factor_exposures = factor_exposures
         self._residual_returns = residual_returns
+        self._cov_cache.clear()
         return self
 
-    def cov(self, halflife: Optional[float] = None, ddof=1) -> ndarray:
+    def transform_many(
+        self,
+        ys: Dict[Any, ndarray],
+        regressor: Optional[object] = None,
+        weights: Optional[ndarray] = None,
+    ) -> Dict[Any, "FactorRiskModel"]:
         """
-        Get the covariance matrix.
+        Transform the factor risk model into multiple universes.
+
+        The model itself is not modified. Each universe is transformed
+        on a copy of the model, while the factor projection operator
+        is computed once and shared across all the universes.
+
+        Parameters
+        ----------
+        ys : Dict[Any, ndarray]
+            The instrument returns of each universe, keyed by the
+            universe name.
+
+        regressor : object, default=None
+            Regressor to transform the input y into factor exposures.
+            If None, the regressor is set to the default WLS.
+
+        weights : Optional[ndarray]
+            Weights of the time frames in the regression, in dimension
+            (T,) where T is the number of time frames.
+
+        Returns
+        -------
+        Dict[Any, FactorRiskModel]
+            The transformed factor risk models keyed by the universe
+            name.
+        """
+        if type(regressor or WLS()) is WLS:
+            # Warm up the cache so that all the copies share the operator
+            self.projection(regressor=regressor, weights=weights)
+
+        return {
+            name: self.copy().transform(y=y, regressor=regressor, weights=weights)
+            for name, y in ys.items()
+        }
+
+    def cov_operator(
+        self, halflife: Optional[float] = None, ddof=1
+    ) -> FactorCovarianceOperator:
+        """
+        Get the covariance matrix as a structured low-rank plus diagonal
+        operator.
+
+        The operator holds the factor exposures, the factor covariance
+        matrix and the specific variances, without forming the dense
+        covariance matrix. The instruments with zero variances are
+        removed unless `show_all_instruments` is enabled.
 
         Parameters
         ----------
@@ -231,9 +436,92 @@ class FactorRiskModel(RiskModel):
 
         Returns
         -------
-        numpy.ndarray
-            A square pairwise covariance matrix which its
-            diagonal entries are the variances.
+        FactorCovarianceOperator
+            Covariance operator of the factor risk model.
+        """
+        B, factor_covariances, R, instruments = self._cov_components(
+            halflife=halflife, ddof=ddof
+        )
+        operator = FactorCovarianceOperator(
+            factor_exposures=B,
+            factor_covariances=factor_covariances,
+            specific_variances=R,
+        )
+        if not self._config.show_all_instruments:
+            valid_instruments = operator.diag() != 0.0
+            if not bool(np.all(valid_instruments)):
+                positions = np.nonzero(valid_instruments)[0]
+                operator = operator.submatrix(positions)
+                if instruments is not None:
+                    instruments = instruments[positions]
+
+        return FactorCovarianceOperator(
+            factor_exposures=operator.factor_exposures,
+            factor_covariances=operator.factor_covariances,
+            specific_variances=operator.specific_variances,
+            instruments=instruments,
+        )
+
+    def _cov_components(self, halflife: Optional[float] = None, ddof=1):
+        """
+        Get the components of the covariance matrix.
+
+        The components are cached per (halflife, ddof), up to
+        `cov_cache_size` entries with the least recently used evicted
+        first. The cache is invalidated when the factor exposures,
+        factor returns or residual returns are replaced, e.g. by fit
+        or transform. The cached arrays are never modified in place.
+
+        Returns
+        -------
+        Tuple[ndarray, ndarray, ndarray, Optional[Index]]
+            Factor exposures in dimension (n, N), factor covariance
+            matrix in dimension (n, n), specific variances in dimension
+            (N,) and the instruments if the factor exposures are a
+            DataFrame.
+        """
+        cache_size = self._config.cov_cache_size
+        if cache_size <= 0:
+            self._cov_cache.clear()
+            return self._compute_cov_components(halflife=halflife, ddof=ddof)
+
+        data = (self._factor_exposures, self._factor_returns, self._residual_returns)
+        if self._cov_cache_data is None or not all(
+            cached is current for cached, current in zip(self._cov_cache_data, data)
+        ):
+            self._cov_cache.clear()
+            self._cov_cache_data = data
+
+        key = (halflife, ddof)
+        try:
+            self._cov_cache.move_to_end(key)
+            return self._cov_cache[key]
+        except KeyError:
+            pass
+
+        components = self._compute_cov_components(halflife=halflife, ddof=ddof)
+        self._cov_cache[key] = components
+        while len(self._cov_cache) > cache_size:
+            self._cov_cache.popitem(last=False)
+        return components
+
+    def _compute_cov_components(self, halflife: Optional[float] = None, ddof=1):
+        """
+        Compute the components of the covariance matrix.
+        """
+        return self._compute_cov_components_grid(halflives=[halflife], ddof=ddof)[0]
+
+    def _compute_cov_components_grid(
+        self, halflives: List[Optional[float]], ddof=1
+    ) -> List[Tuple]:
+        """
+        Compute the components of the covariance matrices of multiple
+        halflives in one pass.
+
+        The exponential weights of the H halflives are stacked in
+        dimension (H, T), so that the factor covariance matrices and
+        the specific variances of all the halflives are computed by
+        the stacked matrix multiplications.
         """
         B = self._factor_exposures
         F = self._factor_returns
@@ -242,21 +530,34 @@ class FactorRiskModel(RiskModel):
         elif isinstance(F, DataFrame):
             F = F.values
 
-        W = None
         T = F.shape[0]
-        if halflife is not None:
-            W = np.array([2 ** (-(T - 1 - t) / halflife) for t in range(0, T)])
-            F = F * (W[:, np.newaxis] ** 0.5)
+        W = np.array(
+            [
+                [
+                    2 ** (-(T - 1 - t) / halflife) if halflife is not None else 1.0
+                    for t in range(0, T)
+                ]
+                for halflife in halflives
+            ]
+        )
 
-        F = F - np.mean(F, axis=0)
-        factor_covariances = (F.T @ F) / (T - ddof)
-        specific_variances = self.specific_variances(weights=W, ddof=ddof)
+        # Factor returns in dimension (H, T, n)
+        F = F * (W[:, :, np.newaxis] ** 0.5)
+        F = F - np.mean(F, axis=1)[:, np.newaxis, :]
+        factor_covariances = (np.swapaxes(F, -1, -2) @ F) / (T - ddof)
 
-        R = specific_variances
+        if all(halflife is None for halflife in halflives):
+            specific_variances = [self.specific_variances(ddof=ddof)] * len(halflives)
+        else:
+            specific_variances = self.specific_variances(weights=W, ddof=ddof)
+
+        if isinstance(specific_variances, DataFrame):
+            specific_variances = [row for _, row in specific_variances.iterrows()]
+
+        instruments = None
         if isinstance(B, DataFrame):
             instruments = self._factor_exposures.columns
             B = B.values
-            R = R.loc[instruments].values
 
         if not isinstance(B, ndarray):
             raise TypeError(
@@ -264,6 +565,143 @@ class FactorRiskModel(RiskModel):
                 f"{B.__class__.__name__}"
             )
 
+        components = []
+        for index in range(len(halflives)):
+            R = specific_variances[index]
+            if instruments is not None:
+                R = R.loc[instruments].values
+            elif isinstance(R, Series):
+                R = R.values
+            components.append((B, factor_covariances[index], R, instruments))
+
+        return components
+
+    def cov(
+        self,
+        halflife: Optional[float] = None,
+        ddof=1,
+        instruments: Optional[Union[List, ndarray, Index]] = None,
+    ) -> ndarray:
+        """
+        Get the covariance matrix.
+
+        Parameters
+        ----------
+        halflife : Optional[float]
+            Half life in applying the exponential weighting on factor
+            returns for computing the factor covariance matrix. If
+            None is passed, no exponential weighting is applied.
+
+        instruments : Optional[Union[List, ndarray, Index]]
+            Instruments of the sub-universe. If provided, the factor
+            exposures and the specific variances are sliced before
+            forming the covariance matrix, so that the cost depends on
+            the size of the sub-universe only. They are the instrument
+            labels if the factor exposures are a DataFrame, or the
+            integer positions otherwise.
+
+        Returns
+        -------
+        numpy.ndarray
+            A square pairwise covariance matrix which its
+            diagonal entries are the variances.
+        """
+        B, factor_covariances, R, model_instruments = self._cov_components(
+            halflife=halflife, ddof=ddof
+        )
+        if instruments is not None:
+            operator = FactorCovarianceOperator(
+                factor_exposures=B,
+                factor_covariances=factor_covariances,
+                specific_variances=R,
+                instruments=model_instruments,
+            ).submatrix(instruments)
+            B = operator.factor_exposures
+            R = operator.specific_variances
+            model_instruments = operator.instruments
+
+        return self._dense_cov(B, factor_covariances, R, model_instruments)
+
+    def cov_grid(
+        self, halflives: List[Optional[float]], ddof=1
+    ) -> Dict[Optional[float], ndarray]:
+        """
+        Get the covariance matrices of multiple halflives.
+
+        The factor covariance matrices and the specific variances of
+        all the halflives are computed in one pass from the stacked
+        exponential weights, sharing the factor and residual returns,
+        instead of calling `cov` for each halflife.
+
+        Parameters
+        ----------
+        halflives : List[Optional[float]]
+            Half lives in applying the exponential weighting on factor
+            returns for computing the factor covariance matrix. If
+            None is passed, no exponential weighting is applied.
+
+        Returns
+        -------
+        Dict[Optional[float], numpy.ndarray]
+            The covariance matrices keyed by the halflives, same as
+            the output of `cov`.
+        """
+        halflives = list(dict.fromkeys(halflives))
+        components = self._compute_cov_components_grid(halflives=halflives, ddof=ddof)
+        return {
+            halflife: self._dense_cov(*halflife_components)
+            for halflife, halflife_components in zip(halflives, components)
+        }
+
+    def vol(self, halflife: Optional[float] = None, ddof=1) -> ndarray:
+        """
+        Get the volatility series.
+
+        The variances are the diagonal of the covariance matrix, i.e.
+        diag(B^T F B) + d, which are computed in O(N n^2) without
+        forming the dense covariance matrix.
+
+        Parameters
+        ----------
+        halflife : Optional[float]
+            Half life in applying the exponential weighting on factor
+            returns for computing the factor covariance matrix. If
+            None is passed, no exponential weighting is applied.
+
+        Returns
+        -------
+        numpy.ndarray
+            Volatility series derived from covariance matrix.
+        """
+        B, factor_covariances, R, instruments = self._cov_components(
+            halflife=halflife, ddof=ddof
+        )
+        variances = FactorCovarianceOperator(
+            factor_exposures=B,
+            factor_covariances=factor_covariances,
+            specific_variances=R,
+        ).diag()
+
+        # Same as the covariance matrix, the zero variance instruments
+        # are set to nan or removed
+        valid_instruments = variances != 0.0
+        vol = np.sqrt(variances)
+        if self._config.show_all_instruments:
+            vol[~valid_instruments] = nan
+        else:
+            vol = vol[valid_instruments]
+            if instruments is not None:
+                instruments = instruments[valid_instruments]
+
+        if instruments is not None:
+            vol = Series(vol, index=instruments)
+
+        return vol
+
+    def _dense_cov(self, B, factor_covariances, R, instruments) -> ndarray:
+        """
+        Form the dense covariance matrix from its components.
+        """
         cov = B.T @ factor_covariances @ B
 
         # Add the specific variances into the covariance matrix
@@ -274,8 +712,10 @@ class FactorRiskModel(RiskModel):
         cov[~valid_instruments, :] = nan
         cov[:, ~valid_instruments] = nan
 
-        if not self._config.show_all_instruments:
-            cov = cov[valid_instruments, :][:, valid_instruments]
+        if not self._config.show_all_instruments and not bool(
+            np.all(valid_instruments)
+        ):
+            cov = cov[np.ix_(valid_instruments, valid_instruments)]
             if isinstance(self._factor_exposures, DataFrame):
                 instruments = instruments[valid_instruments]
 
@@ -284,6 +724,107 @@ class FactorRiskModel(RiskModel):
 
         return cov
 
+    def portfolio_variance(
+        self,
+        weights: Union[ndarray, Series, DataFrame],
+        halflife: Optional[float] = None,
+        ddof=1,
+    ) -> Union[float, ndarray, Series]:
+        """
+        Get the variances of the portfolios.
+
+        The variances are computed in the factor space, i.e.
+
+        .. math::
+            w^T \\Sigma w = (B w)^T \\Sigma_F (B w) + \\sum_i d_i w_i^2
+
+        without forming the dense covariance matrix, so that the cost
+        is O(P N n) for P portfolios.
+
+        Parameters
+        ----------
+        weights : Union[ndarray, Series, DataFrame]
+            Weights of a portfolio in dimension (N,), or weights of P
+            portfolios in dimension (P, N). The pandas inputs are
+            aligned with the instruments of the model, and the missing
+            instruments are treated as zero weights. The nan weights
+            are propagated to nan variances.
+
+        halflife : Optional[float]
+            Half life in applying the exponential weighting on factor
+            returns for computing the factor covariance matrix. If
+            None is passed, no exponential weighting is applied.
+
+        Returns
+        -------
+        Union[float, ndarray, Series]
+            The variance of the portfolio, or the variances of the P
+            portfolios in dimension (P,).
+        """
+        B, factor_covariances, R, instruments = self._cov_components(
+            halflife=halflife, ddof=ddof
+        )
+        operator = FactorCovarianceOperator(
+            factor_exposures=B,
+            factor_covariances=factor_covariances,
+            specific_variances=R,
+            instruments=instruments,
+        )
+        return operator.quad_form(weights)
+
+    def solve(
+        self,
+        x: Union[ndarray, Series, DataFrame],
+        halflife: Optional[float] = None,
+        ddof=1,
+    ) -> Union[ndarray, Series, DataFrame]:
+        """
+        Solve the linear system of the covariance matrix.
+
+        The system is solved by the Woodbury identity over the factor
+        covariance matrix and the specific variances in O(N n^2),
+        without forming or inverting the dense covariance matrix.
+
+        Parameters
+        ----------
+        x : Union[ndarray, Series, DataFrame]
+            Right hand side in dimension (N,), or P right hand sides
+            in dimension (N, P). The instruments with zero variances
+            are excluded, same as the covariance matrix.
+
+        halflife : Optional[float]
+            Half life in applying the exponential weighting on factor
+            returns for computing the factor covariance matrix. If
+            None is passed, no exponential weighting is applied.
+
+        Returns
+        -------
+        Union[ndarray, Series, DataFrame]
+            The solution in the same dimension as x.
+        """
+        return self.inv_operator(halflife=halflife, ddof=ddof).matvec(x)
+
+    def inv_operator(
+        self, halflife: Optional[float] = None, ddof=1
+    ) -> FactorCovarianceOperator:
+        """
+        Get the inverse covariance matrix, i.e. the precision matrix,
+        as a structured low-rank plus diagonal operator.
+
+        Parameters
+        ----------
+        halflife : Optional[float]
+            Half life in applying the exponential weighting on factor
+            returns for computing the factor covariance matrix. If
+            None is passed, no exponential weighting is applied.
+
+        Returns
+        -------
+        FactorCovarianceOperator
+            Operator of the inverse covariance matrix.
+        """
+        return self.cov_operator(halflife=halflife, ddof=ddof).inv()
+
     def write_directory(self, path: str, format="parquet", **kwargs):
         """
         Write the factor risk model to directory.
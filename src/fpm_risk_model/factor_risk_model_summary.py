@@ -0,0 +1,247 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from numpy import ndarray
+from pandas import DataFrame, Series
+
+from .factor_risk_model import FactorRiskModel
+
+
+class FactorRiskModelSummary(FactorRiskModel):
+    """
+    Summary of a factor risk model.
+
+    The summary only keeps the factor exposures, the factor covariance
+    matrix and the specific variances of a factor risk model, which
+    are all the components of its covariance matrix, but not the
+    factor returns and residual returns histories. The covariance
+    related methods, e.g. `cov`, `vol` and `corr`, are supported for
+    the halflife and degrees of freedom of the summary only.
+    """
+
+    def __init__(
+        self,
+        factor_exposures: ndarray,
+        factor_covariances: ndarray,
+        specific_variances: ndarray,
+        halflife: Optional[float] = None,
+        ddof: int = 1,
+        **kwargs,
+    ):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        factor_exposures : ndarray
+          Factor exposures in dimension (n, N).
+        factor_covariances : ndarray
+          Factor covariance matrix in dimension (n, n).
+        specific_variances : ndarray
+          Specific variances in dimension (N,).
+        halflife : Optional[float]
+          Half life of the factor covariance matrix and the specific
+          variances.
+        ddof : int
+          Degrees of freedom of the factor covariance matrix and the
+          specific variances.
+        """
+        super().__init__(factor_exposures=factor_exposures, **kwargs)
+        self._factor_covariances = factor_covariances
+        self._specific_variances = specific_variances
+        self._halflife = halflife
+        self._ddof = ddof
+
+    @classmethod
+    def from_risk_model(
+        cls,
+        risk_model: FactorRiskModel,
+        halflife: Optional[float] = None,
+        ddof: int = 1,
+    ) -> "FactorRiskModelSummary":
+        """
+        Summarize a factor risk model.
+
+        Parameters
+        ----------
+        risk_model : FactorRiskModel
+          Factor risk model to summarize.
+        halflife : Optional[float]
+          Half life in applying the exponential weighting on factor
+          returns for computing the factor covariance matrix. If
+          None is passed, no exponential weighting is applied.
+        ddof : int
+          Degrees of freedom.
+
+        Returns
+        -------
+        FactorRiskModelSummary
+          Summary of the factor risk model.
+        """
+        _, factor_covariances, specific_variances, _ = risk_model._cov_components(
+            halflife=halflife, ddof=ddof
+        )
+        return cls(
+            factor_exposures=risk_model.factor_exposures,
+            factor_covariances=factor_covariances,
+            specific_variances=specific_variances,
+            halflife=halflife,
+            ddof=ddof,
+            **risk_model.config.dict(),
+        )
+
+    @property
+    def factor_covariances(self) -> ndarray:
+        """
+        Return the factor covariance matrix in dimension (n, n).
+        """
+        return self._factor_covariances
+
+    @property
+    def halflife(self) -> Optional[float]:
+        """
+        Return the half life of the summary.
+        """
+        return self._halflife
+
+    @property
+    def ddof(self) -> int:
+        """
+        Return the degrees of freedom of the summary.
+        """
+        return self._ddof
+
+    def copy(self) -> object:
+        """
+        Copy the model.
+
+        Returns
+        -------
+        object
+          Copy of the model.
+        """
+        return FactorRiskModelSummary(
+            factor_exposures=self._factor_exposures.copy(),
+            factor_covariances=self._factor_covariances.copy(),
+            specific_variances=self._specific_variances.copy(),
+            halflife=self._halflife,
+            ddof=self._ddof,
+            **self._config.dict(),
+        )
+
+    def specific_variances(
+        self, weights=None, ddof=1, halflife: Optional[float] = None
+    ) -> ndarray:
+        """
+        Get specific variances.
+
+        Only the specific variances of the summary are available, so
+        that the halflife and degrees of freedom must be the ones of
+        the summary and the weights must not be provided.
+
+        Parameters
+        ----------
+        weights : Optional[ndarray]
+          Not supported by the summary. Must be None.
+        ddof : int
+          Degrees of freedom, which must be the ones of the summary.
+        halflife : Optional[float]
+          Half life, which must be the one of the summary.
+
+        Returns
+        -------
+        ndarray
+          Specific variances of the instruments.
+        """
+        if weights is not None:
+            raise ValueError(
+                "Specific variances of the summary are not available with weights"
+            )
+        self._validate_cov_params(halflife=halflife, ddof=ddof)
+
+        # Return a copy so that the summary cannot be modified
+        if isinstance(self._factor_exposures, DataFrame):
+            return Series(
+                self._specific_variances.copy(), index=self._factor_exposures.columns
+            )
+        return self._specific_variances.copy()
+
+    def transform(
+        self,
+        y: ndarray,
+        regressor: Optional[object] = None,
+        weights: Optional[ndarray] = None,
+    ) -> object:
+        """
+        Transform the factor risk model.
+
+        Not supported by the summary, as the factor returns are not kept.
+        """
+        raise NotImplementedError(
+            "Summary of the factor risk model cannot be transformed as the "
+            "factor returns are not kept. Transform the risk model before "
+            "summarizing it."
+        )
+
+    def transform_many(
+        self,
+        ys: Dict[Any, ndarray],
+        regressor: Optional[object] = None,
+        weights: Optional[ndarray] = None,
+    ) -> Dict[Any, FactorRiskModel]:
+        """
+        Transform the factor risk model into multiple universes.
+
+        Not supported by the summary, as the factor returns are not kept.
+        """
+        raise NotImplementedError(
+            "Summary of the factor risk model cannot be transformed as the "
+            "factor returns are not kept. Transform the risk model before "
+            "summarizing it."
+        )
+
+    def write_directory(self, path: str, format="parquet", **kwargs):
+        """
+        Write the factor risk model to directory.
+
+        Not supported by the summary, as the directory layout requires
+        the factor returns and residual returns.
+        """
+        raise NotImplementedError(
+            "Summary of the factor risk model cannot be written to directory "
+            "as the factor returns and residual returns are not kept"
+        )
+
+    def _cov_components(self, halflife: Optional[float] = None, ddof=1):
+        """
+        Get the components of the covariance matrix from the summary.
+        """
+        self._validate_cov_params(halflife=halflife, ddof=ddof)
+
+        B = self._factor_exposures
+        instruments = None
+        if isinstance(B, DataFrame):
+            instruments = B.columns
+            B = B.values
+
+        return B, self._factor_covariances, self._specific_variances, instruments
+
+    def _validate_cov_params(self, halflife: Optional[float] = None, ddof=1):
+        """
+        Validate the halflife and degrees of freedom against the summary.
+        """
+        if halflife != self._halflife or ddof != self._ddof:
+            raise ValueError(
+                f"The summary only supports halflife ({self._halflife}) and "
+                f"ddof ({self._ddof}), but not halflife ({halflife}) and "
+                f"ddof ({ddof})"
+            )
+
+    def _compute_cov_components_grid(
+        self, halflives: List[Optional[float]], ddof=1
+    ) -> List[Tuple]:
+        """
+        Get the components of the covariance matrices from the summary.
+        """
+        return [
+            self._cov_components(halflife=halflife, ddof=ddof) for halflife in halflives
+        ]
@@ -3,10 +3,14 @@ from typing import Optional
 
 from numpy import ndarray
 
-from ..engine import LinAlgEngine
+from ..engine import LinAlgEngine, NumpyEngine
 
+np = NumpyEngine()
 linalg = LinAlgEngine()
 
+# Executors supported in the weighted least squares solver
+_SUPPORTED_EXECUTORS = ["closed", "cholesky", "qr", "lstsq", "auto"]
+
 
 @dataclass
 class RegressionResult:
@@ -27,6 +31,9 @@ class RegressionResult:
       beta is a matrix in shape (n, k)
       alpha is a matrix in shape (m, k)
 
+    For a batched regression, a leading batch dimension B is added
+    to all the matrices, e.g. beta is in shape (B, n, k).
+
     Parameters
     ----------
     alpha: Optional[ndarray]
@@ -47,7 +54,7 @@ class WLS:
     objective.
     """
 
-    def __init__(self, executor: str = "closed"):
+    def __init__(self, executor: str = "closed", rcond: float = 1e-8):
         """
         Construct
 
@@ -55,8 +62,30 @@ class WLS:
         ----------
         executor : str
           Executor name. Default is "closed", deriving from closed formula.
+          Options are
+
+          - "closed": pseudo-inverse of the normal equations X^T W X.
+          - "cholesky": Cholesky factorisation of the normal equations,
+            fastest for tall and well-conditioned X.
+          - "qr": QR factorisation of the weighted X, more accurate than
+            Cholesky for ill-conditioned X.
+          - "lstsq": least squares solver of the backend engine, which
+            returns the minimum norm solution for rank deficient X.
+          - "auto": choose among "cholesky", "qr" and "lstsq" by the shape
+            and the condition number of X.
+        rcond : float
+          Reciprocal condition number of X^T W X to select the executor
+          in "auto" mode. Cholesky is used if the reciprocal condition
+          number is above `rcond`, QR if it is above the machine
+          precision, and otherwise lstsq. Default is 1e-8.
         """
+        if executor not in _SUPPORTED_EXECUTORS:
+            raise ValueError(
+                f"Executor {executor} is not supported. Options are "
+                f"{_SUPPORTED_EXECUTORS}"
+            )
         self._executor = executor
+        self._rcond = rcond
 
     def fit(self, X: ndarray, y: ndarray, weights: Optional[ndarray] = None):
         """
@@ -72,30 +101,292 @@ class WLS:
           Weightings in regressiond data. The dimension should be
           same as y.
         """
+        return self._fit(X=X, y=y, weights=weights)
+
+    def fit_batch(self, X: ndarray, y: ndarray, weights: Optional[ndarray] = None):
+        """
+        Fit the coefficients of a stack of regressions in one call.
+
+        All the regressions are solved by the stacked linear algebra
+        routines of the backend engine, instead of a Python loop.
+
+        Parameters
+        ----------
+        X: ndarray
+          Training data in dimension (B, m, n).
+        y: ndarray
+          Target values in dimension (B, m, k).
+        weights: Optional[ndarray]
+          Weightings in regression data in dimension (B, m).
+
+        Returns
+        -------
+        RegressionResult
+          Batched regression result of which alpha is in dimension
+          (B, m, k) and beta is in dimension (B, n, k).
+        """
+        if len(X.shape) != 3 or len(y.shape) != 3:
+            raise ValueError(
+                f"Expect 3-dimensional X and y, but got {X.shape} and {y.shape}"
+            )
+        elif X.shape[:2] != y.shape[:2]:
+            raise ValueError(
+                f"Dimension of X {X.shape} does not align with y {y.shape}"
+            )
+
+        return self._fit(X=X, y=y, weights=weights)
+
+    def projection(self, X: ndarray, weights: Optional[ndarray] = None) -> ndarray:
+        """
+        Return the projection operator of the regression.
+
+        The projection operator P depends on X and the weights only,
+        so that the coefficients of any target values y are
+
+          beta = P @ y
+
+        It can be computed once and reused across different y.
+
+        Parameters
+        ----------
+        X: ndarray
+          Training data in dimension (m, n), or (B, m, n) for a stack
+          of regressions.
+        weights: Optional[ndarray]
+          Weightings in regression data in dimension (m,), or (B, m)
+          for a stack of regressions.
+
+        Returns
+        -------
+        ndarray
+          Projection operator in dimension (n, m), or (B, n, m) for a
+          stack of regressions.
+        """
+        return self._fit(X=X, y=None, weights=weights).beta
+
+    @property
+    def executor(self) -> str:
+        """
+        Return the executor name.
+        """
+        return self._executor
+
+    def _fit(self, X: ndarray, y: Optional[ndarray], weights: Optional[ndarray] = None):
+        """
+        Fit the coefficients by the executor.
+
+        If y is None, the projection operator is returned as the
+        coefficients, i.e. y is an identity matrix.
+        """
         if self._executor == "closed":
             return self._close_fit(X=X, y=y, weights=weights)
+        elif self._executor == "cholesky":
+            return self._cholesky_fit(X=X, y=y, weights=weights)
+        elif self._executor == "qr":
+            return self._qr_fit(X=X, y=y, weights=weights)
+        elif self._executor == "lstsq":
+            return self._lstsq_fit(X=X, y=y, weights=weights)
+        elif self._executor == "auto":
+            return self._auto_fit(X=X, y=y, weights=weights, rcond=self._rcond)
 
         raise ValueError(f"Executor {self._executor} is not supported")
 
     @staticmethod
-    def _close_fit(X: ndarray, y: ndarray, weights: Optional[ndarray] = None):
+    def _transpose(X: ndarray) -> ndarray:
+        """
+        Transpose the last two axes, which supports stacked matrices.
+        """
+        return np.swapaxes(X, -1, -2)
+
+    @staticmethod
+    def _matmul(A: ndarray, y: Optional[ndarray]) -> ndarray:
+        """
+        Multiply A by y, where None y is an identity matrix.
+        """
+        return A if y is None else A @ y
+
+    @staticmethod
+    def _result(X: ndarray, y: Optional[ndarray], beta: ndarray) -> RegressionResult:
+        """
+        Return the regression result of the coefficients.
+        """
+        alpha = None if y is None else y - X @ beta
+        return RegressionResult(alpha=alpha, beta=beta)
+
+    @staticmethod
+    def _close_fit(X: ndarray, y: Optional[ndarray], weights: Optional[ndarray] = None):
         """
         Fit the coefficients with closed formula.
 
         coefficients = (X^T @ W @ X)^{-1} @ X^T @ W @ y
         """
+        X_t = WLS._transpose(X)
         if isinstance(weights, ndarray):
-            if len(weights.shape) == 1 and weights.shape[0] == y.shape[0]:
-                weights = weights**0.5
-                X_t_w = X.T * weights * weights.T
-                beta = linalg.pinv(X_t_w @ X) @ X_t_w @ y
+            if WLS._is_weights_aligned(X=X, weights=weights):
+                weights = (weights**0.5)[..., np.newaxis, :]
+                X_t_w = X_t * weights * weights
+                beta = WLS._matmul(linalg.pinv(X_t_w @ X) @ X_t_w, y)
             else:
                 raise ValueError(
-                    f"Dimension of y {y.shape} does not align with weights "
+                    f"Dimension of X {X.shape} does not align with weights "
                     f"{weights.shape}"
                 )
         else:
-            beta = linalg.pinv(X.T @ X) @ X.T @ y
+            beta = WLS._matmul(linalg.pinv(X_t @ X) @ X_t, y)
 
-        alpha = y - X @ beta
-        return RegressionResult(alpha=alpha, beta=beta)
+        return WLS._result(X=X, y=y, beta=beta)
+
+    @staticmethod
+    def _is_weights_aligned(X: ndarray, weights: ndarray) -> bool:
+        """
+        Check whether the weights align with the rows of X.
+        """
+        return weights.shape == X.shape[:-1]
+
+    @staticmethod
+    def _sqrt_weights(X: ndarray, weights: Optional[ndarray] = None):
+        """
+        Return the square root of the weights as a column vector.
+        """
+        if not isinstance(weights, ndarray):
+            return None
+
+        if not WLS._is_weights_aligned(X=X, weights=weights):
+            raise ValueError(
+                f"Dimension of X {X.shape} does not align with weights "
+                f"{weights.shape}"
+            )
+
+        return np.sqrt(weights)[..., np.newaxis]
+
+    @staticmethod
+    def _cholesky_solve(
+        gram: ndarray,
+        X_w: ndarray,
+        y: Optional[ndarray],
+        sqrt_weights: Optional[ndarray],
+    ) -> ndarray:
+        """
+        Solve the normal equations by the Cholesky factorisation.
+
+        (X^T W X) @ beta = L @ L^T @ beta = X^T W y
+        """
+        if sqrt_weights is not None:
+            X_w = X_w * sqrt_weights
+        L = linalg.cholesky(gram)
+        return linalg.solve(
+            WLS._transpose(L),
+            linalg.solve(L, WLS._matmul(WLS._transpose(X_w), y)),
+        )
+
+    @staticmethod
+    def _qr_solve(
+        X_w: ndarray, y: Optional[ndarray], sqrt_weights: Optional[ndarray]
+    ) -> ndarray:
+        """
+        Solve the least squares problem by the reduced QR factorisation.
+
+        W^{1/2} X = Q @ R and R @ beta = Q^T @ W^{1/2} @ y
+        """
+        Q, R = linalg.qr(X_w)
+        if sqrt_weights is not None:
+            Q = Q * sqrt_weights
+        return linalg.solve(R, WLS._matmul(WLS._transpose(Q), y))
+
+    @staticmethod
+    def _lstsq_solve(
+        X_w: ndarray, y: Optional[ndarray], sqrt_weights: Optional[ndarray]
+    ) -> ndarray:
+        """
+        Solve the least squares problem by the backend engine solver.
+        """
+        if y is None or len(X_w.shape) > 2:
+            # The least squares solver does not support stacked matrices,
+            # while the pseudo-inverse gives the same minimum norm solution
+            projection = linalg.pinv(X_w)
+            if sqrt_weights is not None:
+                projection = projection * WLS._transpose(sqrt_weights)
+            return WLS._matmul(projection, y)
+
+        if sqrt_weights is not None:
+            y = y * sqrt_weights
+        if linalg.name == "numpy":
+            # Use the machine precision cutoff of the singular values
+            # without the deprecation warning of the older versions
+            return linalg.lstsq(X_w, y, rcond=None)[0]
+        return linalg.lstsq(X_w, y)[0]
+
+    @classmethod
+    def _cholesky_fit(
+        cls, X: ndarray, y: Optional[ndarray], weights: Optional[ndarray] = None
+    ) -> RegressionResult:
+        """
+        Fit the coefficients with Cholesky factorisation.
+        """
+        sqrt_weights = cls._sqrt_weights(X=X, weights=weights)
+        X_w = X if sqrt_weights is None else X * sqrt_weights
+        beta = cls._cholesky_solve(cls._transpose(X_w) @ X_w, X_w, y, sqrt_weights)
+        return cls._result(X=X, y=y, beta=beta)
+
+    @classmethod
+    def _qr_fit(
+        cls, X: ndarray, y: Optional[ndarray], weights: Optional[ndarray] = None
+    ) -> RegressionResult:
+        """
+        Fit the coefficients with QR factorisation.
+        """
+        sqrt_weights = cls._sqrt_weights(X=X, weights=weights)
+        X_w = X if sqrt_weights is None else X * sqrt_weights
+        beta = cls._qr_solve(X_w, y, sqrt_weights)
+        return cls._result(X=X, y=y, beta=beta)
+
+    @classmethod
+    def _lstsq_fit(
+        cls, X: ndarray, y: Optional[ndarray], weights: Optional[ndarray] = None
+    ) -> RegressionResult:
+        """
+        Fit the coefficients with the least squares solver.
+        """
+        sqrt_weights = cls._sqrt_weights(X=X, weights=weights)
+        X_w = X if sqrt_weights is None else X * sqrt_weights
+        beta = cls._lstsq_solve(X_w, y, sqrt_weights)
+        return cls._result(X=X, y=y, beta=beta)
+
+    @classmethod
+    def _auto_fit(
+        cls,
+        X: ndarray,
+        y: Optional[ndarray],
+        weights: Optional[ndarray] = None,
+        rcond: float = 1e-8,
+    ) -> RegressionResult:
+        """
+        Fit the coefficients with the executor chosen by the shape and
+        the condition number of X.
+
+        Underdetermined systems are solved by lstsq. Otherwise, the
+        reciprocal condition number of X^T W X is estimated from its
+        eigenvalues, which is cheap for the tall and skinny X. For
+        stacked systems, the executor is chosen by the worst
+        conditioned system in the stack.
+        """
+        sqrt_weights = cls._sqrt_weights(X=X, weights=weights)
+        X_w = X if sqrt_weights is None else X * sqrt_weights
+        m, n = X_w.shape[-2:]
+        if m < n:
+            beta = cls._lstsq_solve(X_w, y, sqrt_weights)
+            return cls._result(X=X, y=y, beta=beta)
+
+        gram = cls._transpose(X_w) @ X_w
+        eigenvalues = linalg.eigvalsh(gram)
+        max_eigenvalues = np.max(np.abs(eigenvalues), axis=-1)
+        min_eigenvalues = np.min(eigenvalues, axis=-1)
+        eps = float(np.finfo(gram.dtype).eps) * m
+        if bool(np.all(min_eigenvalues > rcond * max_eigenvalues)):
+            beta = cls._cholesky_solve(gram, X_w, y, sqrt_weights)
+        elif bool(np.all(min_eigenvalues > eps * max_eigenvalues)):
+            beta = cls._qr_solve(X_w, y, sqrt_weights)
+        else:
+            beta = cls._lstsq_solve(X_w, y, sqrt_weights)
+
+        return cls._result(X=X, y=y, beta=beta)
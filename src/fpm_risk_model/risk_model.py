@@ -95,8 +95,15 @@ class RiskModel(ABC):
             diagonal entries are all ones.
         """
         cov = self.cov(**kwargs)
-        vol = np.sqrt(np.diagonal(cov))
-        return ((cov / vol).T / vol).T
+        # Scale a writable copy of the covariance matrix in place, as
+        # the values of the covariance frame can be read-only
+        values = np.array(cov.values if isinstance(cov, DataFrame) else cov)
+        vol = np.sqrt(np.diagonal(values))
+        values /= vol[:, np.newaxis]
+        values /= vol[np.newaxis, :]
+        if isinstance(cov, DataFrame):
+            return DataFrame(values, index=cov.index, columns=cov.columns)
+        return values
 
     def asdict(self):
         """
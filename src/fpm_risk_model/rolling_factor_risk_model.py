@@ -1,14 +1,19 @@
 import json
+from collections.abc import Mapping
 from datetime import datetime
 from multiprocessing import cpu_count
 from multiprocessing.pool import ThreadPool
-from os import makedirs
-from os.path import join
-from typing import Dict, Optional
+from os import listdir, makedirs, replace
+from os.path import exists, join
+from shutil import rmtree
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
 
+from numpy import allclose, stack
 from pandas import DataFrame, Timestamp
 
 from .factor_risk_model import FactorRiskModel
+from .factor_risk_model_summary import FactorRiskModelSummary
+from .regressor import WLS
 from .risk_model import RiskModel
 from .rolling_risk_model import RollingRiskModel
 
@@ -54,12 +59,134 @@ class RollingFactorRiskModel(RollingRiskModel):
             values=values,
         )
 
+    def fit(
+        self,
+        X: DataFrame,
+        validity: Optional[DataFrame] = None,
+        weights: Optional[DataFrame] = None,
+        checkpoint_dir: Optional[str] = None,
+        checkpoint_format: str = "parquet",
+        retain: str = "full",
+        cov_halflife: Optional[float] = None,
+        **kwargs,
+    ) -> object:
+        """
+        Fit the model.
+
+        Parameters
+        ----------
+        X: DataFrame
+            The instrument returns of which its index and columns
+            are the date / time and return values.
+
+        validity: DataFrame
+            The instrument validity on the date.
+
+        weights: DataFrame
+            The weights of the instruments, same dimension as the
+            instrument returns.
+
+        checkpoint_dir: Optional[str]
+            Directory to checkpoint the fitted risk models. If provided,
+            each risk model is written to the directory once fitted,
+            in the same layout as `write_directory`, and released from
+            memory. The dates already checkpointed in the directory
+            are skipped, so that an interrupted fit can be resumed.
+            The fitted risk models are then read from the directory
+            lazily on access.
+
+        checkpoint_format: str
+            Format of the checkpoints. Default is "parquet". Options
+            are "csv", "parquet" and "hdf".
+
+        retain: str
+            Storage of the fitted risk models in memory. Options are
+            "full", "compact" and "summary". Default is "full", which
+            keeps each risk model as it is. If "compact", the
+            instrument returns are stored once, shared by the
+            overlapping windows, and each risk model only keeps its
+            factor exposures and factor returns. The residual returns
+            are rebuilt from the shared instrument returns lazily on
+            access. If "summary", each risk model is reduced to its
+            factor exposures, factor covariance matrix and specific
+            variances right after fitting, which support `cov`, `vol`
+            and `corr` only. Not used if checkpoint_dir is provided.
+
+        cov_halflife: Optional[float]
+            Half life of the factor covariance matrix and the specific
+            variances in the summary. Only used if retain is "summary".
+
+        **kwargs
+            Other keyword arguments of `RollingRiskModel.fit`, e.g.
+            workers.
+
+        Returns
+        -------
+        object
+            The object itself.
+        """
+        _validate_retain(retain)
+        if checkpoint_dir is None and retain == "full":
+            return super().fit(X=X, validity=validity, weights=weights, **kwargs)
+        elif checkpoint_dir is None and retain == "summary":
+            self._values = self._fit_values(
+                X=X,
+                validity=validity,
+                weights=weights,
+                store=lambda _, risk_model: FactorRiskModelSummary.from_risk_model(
+                    risk_model, halflife=cov_halflife
+                ),
+                **kwargs,
+            )
+            return self
+        elif checkpoint_dir is None:
+            returns = X.fillna(0.0)
+            self._values = _CompactValues(
+                returns=returns,
+                values=self._fit_values(
+                    X=X,
+                    validity=validity,
+                    weights=weights,
+                    store=lambda _, risk_model: _CompactFactorRiskModel(
+                        risk_model=risk_model, returns=returns
+                    ),
+                    **kwargs,
+                ),
+            )
+            return self
+
+        makedirs(checkpoint_dir, exist_ok=True)
+        checkpoint_keys = set(_checkpoint_keys(checkpoint_dir))
+
+        def _store_checkpoint(key: datetime, risk_model: FactorRiskModel) -> None:
+            _write_checkpoint(checkpoint_dir, key, risk_model, checkpoint_format)
+            checkpoint_keys.add(Timestamp(key))
+            return None
+
+        self._fit_values(
+            X=X,
+            validity=validity,
+            weights=weights,
+            dates={date for date in X.index if date not in checkpoint_keys},
+            store=_store_checkpoint,
+            **kwargs,
+        )
+
+        keys = sorted(checkpoint_keys)
+        _write_checkpoint_metadata(checkpoint_dir, keys, self.asdict())
+        self._values = _DirectoryValues(
+            path=checkpoint_dir, keys=keys, format=checkpoint_format
+        )
+        return self
+
     def transform(
         self,
         y: DataFrame,
         validity: Optional[DataFrame] = None,
         regressor: Optional[object] = None,
         start_date: Optional[Timestamp] = None,
+        retain: str = "full",
+        cov_halflife: Optional[float] = None,
     ) -> object:
         """
         Transform the rolling factor risk model.
@@ -69,6 +196,10 @@ class RollingFactorRiskModel(RollingRiskModel):
         factor risk model is fitted by the estimation universe,
         and then transformed by the model universe.
 
+        If neither the validity nor a regressor other than the plain
+        WLS is provided, the regressions of the windows are stacked
+        and solved in batches by `WLS.fit_batch`.
+
         Parameters
         ----------
         y : DataFrame
@@ -82,22 +213,453 @@ class RollingFactorRiskModel(RollingRiskModel):
             Regressor to transform the input y into factor exposures.
             If None, the regressor is set to the default WLS.
 
+        retain: str
+            Storage of the transformed risk models in memory. Options
+            are "full", "compact" and "summary". Default is "full".
+            See the method `fit` for details. If the risk models are
+            checkpointed and retain is "full", the transformed risk
+            models replace the checkpoints in the directory instead,
+            and the checkpoints not transformed are removed.
+
+        cov_halflife: Optional[float]
+            Half life of the factor covariance matrix and the specific
+            variances in the summary. Only used if retain is "summary".
+
         Returns
         -------
         object
             The transformed rolling factor risk model.
         """
-        if not isinstance(y, DataFrame):
-            raise TypeError(
-                "Only DataFrame type is supported, but not " f"{y.__class__.__name__}"
+        _validate_retain(retain)
+        self._validate_transform_input(y)
+        existing_values = self._values
+        params = dict(
+            values=existing_values,
+            y=y,
+            validity=validity,
+            regressor=regressor,
+            start_date=start_date,
+        )
+        if isinstance(existing_values, _DirectoryValues) and retain == "full":
+            # Write the transformed risk models back into the checkpoint
+            # directory, so that they are not held in memory
+            path, format = existing_values.path, existing_values.format
+            keys = []
+
+            def _store_checkpoint(key: datetime, risk_model: FactorRiskModel) -> None:
+                _write_checkpoint(path, key, risk_model, format)
+                keys.append(Timestamp(key))
+                return None
+
+            self._transform_values(store=_store_checkpoint, **params)
+            # Remove the checkpoints not transformed, so that they are
+            # not resumed as the transformed ones
+            for key in set(existing_values.keys()).difference(keys):
+                rmtree(join(path, _directory_name(key)))
+            keys = sorted(keys)
+            _write_checkpoint_metadata(path, keys, self.asdict())
+            self._values = _DirectoryValues(path=path, keys=keys, format=format)
+            return self
+
+        if retain == "summary":
+            self._values = self._transform_values(
+                store=lambda _, risk_model: FactorRiskModelSummary.from_risk_model(
+                    risk_model, halflife=cov_halflife
+                ),
+                **params,
             )
+        elif retain == "compact":
+            returns = y.fillna(0.0)
+            self._values = _CompactValues(
+                returns=returns,
+                values=self._transform_values(
+                    store=lambda _, risk_model: _CompactFactorRiskModel(
+                        risk_model=risk_model, returns=returns
+                    ),
+                    **params,
+                ),
+            )
+        else:
+            self._values = self._transform_values(**params)
 
-        if not self._config.window:
-            raise ValueError(
-                f"Rolling timeframe must be specified, but not {self._config.window}"
+        return self
+
+    def update(
+        self,
+        X: DataFrame,
+        validity: Optional[DataFrame] = None,
+        weights: Optional[DataFrame] = None,
+        y: Optional[DataFrame] = None,
+        y_validity: Optional[DataFrame] = None,
+        regressor: Optional[object] = None,
+        **kwargs,
+    ) -> object:
+        """
+        Update the rolling factor risk model with new dates.
+
+        Only the windows ending on the dates which are not in the
+        keys are fitted, and transformed if the model universe returns
+        are provided. They are then merged into the existing risk
+        models. For example, a daily update fits one window instead of
+        the whole history. If the model is fitted with a checkpoint
+        directory, the new risk models are written into the directory
+        and read lazily, same as the fit.
+
+        Parameters
+        ----------
+        X : DataFrame
+            The instrument returns of which its index and columns
+            are the date / time and return values. It must contain
+            at least the window of history before the new dates.
+
+        validity: DataFrame
+            The instrument validity on the date.
+
+        weights: DataFrame
+            The weights of the instruments, same dimension as the
+            instrument returns.
+
+        y : Optional[DataFrame]
+            The instrument returns of the model universe to transform
+            the new risk models. If None, the new risk models are not
+            transformed.
+
+        y_validity : Optional[DataFrame]
+            The instrument validity of the model universe on the date.
+
+        regressor : object, default=None
+            Regressor to transform the input y into factor exposures.
+            If None, the regressor is set to the default WLS.
+
+        **kwargs
+            Other keyword arguments of the method `fit`, e.g. workers.
+
+        Returns
+        -------
+        object
+            The updated rolling factor risk model.
+        """
+        if not isinstance(X, DataFrame):
+            raise TypeError(f"Invalid type of X {X.__class__.__name__}")
+
+        if self._config.window is None:
+            raise ValueError("The window must be provided in the config.")
+
+        if y is not None:
+            self._validate_transform_input(y)
+
+        existing_values = self._values if self._values is not None else {}
+        window = self._config.window
+        dates = [date for date in X.index[window:] if date not in existing_values]
+        if not dates:
+            return self
+
+        # Only the history of the new windows is required
+        start_index = X.index.get_loc(dates[0]) - window
+        X = X.iloc[start_index:]
+        if validity is not None:
+            validity = validity.loc[validity.index >= X.index[0]]
+
+        def _transform(
+            key: datetime, risk_model: FactorRiskModel
+        ) -> Optional[FactorRiskModel]:
+            if y is None:
+                return risk_model
+            return self._transform_value(
+                risk_model=risk_model,
+                y=y,
+                validity=y_validity,
+                regressor=regressor,
+                index=key,
+            )
+
+        if isinstance(existing_values, _DirectoryValues):
+            # Write the new windows into the checkpoint directory same
+            # as the fit, so that they are not held in memory
+            path, format = existing_values.path, existing_values.format
+            keys = set(existing_values.keys())
+
+            def _store_checkpoint(key: datetime, risk_model: FactorRiskModel) -> None:
+                risk_model = _transform(key, risk_model)
+                if risk_model is not None:
+                    _write_checkpoint(path, key, risk_model, format)
+                    keys.add(Timestamp(key))
+                return None
+
+            self._fit_values(
+                X=X,
+                validity=validity,
+                weights=weights,
+                dates=set(dates),
+                store=_store_checkpoint,
+                **kwargs,
+            )
+            keys = sorted(keys)
+            _write_checkpoint_metadata(path, keys, self.asdict())
+            self._values = _DirectoryValues(path=path, keys=keys, format=format)
+            return self
+
+        if isinstance(existing_values, _CompactValues):
+            # Append the returns of the new dates to the shared returns,
+            # while the existing windows keep rebuilding from the same
+            # returns as before
+            returns = existing_values.returns.combine_first(
+                (X if y is None else y).fillna(0.0)
+            ).fillna(0.0)
+
+            def _store_compact(
+                key: datetime, risk_model: FactorRiskModel
+            ) -> Optional[_CompactFactorRiskModel]:
+                risk_model = _transform(key, risk_model)
+                if risk_model is None:
+                    return None
+                return _CompactFactorRiskModel(risk_model=risk_model, returns=returns)
+
+            values = self._fit_values(
+                X=X,
+                validity=validity,
+                weights=weights,
+                dates=set(dates),
+                store=_store_compact,
+                **kwargs,
+            )
+            values = {**existing_values.compact_values, **values}
+            self._values = _CompactValues(
+                returns=returns, values={key: values[key] for key in sorted(values)}
+            )
+            return self
+
+        store = _transform
+        summary = next(iter(existing_values.values()), None)
+        if isinstance(summary, FactorRiskModelSummary):
+            # Summarize the new risk models same as the existing ones
+            def _store_summary(
+                key: datetime, risk_model: FactorRiskModel
+            ) -> Optional[FactorRiskModelSummary]:
+                risk_model = _transform(key, risk_model)
+                if risk_model is None:
+                    return None
+                return FactorRiskModelSummary.from_risk_model(
+                    risk_model, halflife=summary.halflife, ddof=summary.ddof
+                )
+
+            store = _store_summary
+
+        values = self._fit_values(
+            X=X,
+            validity=validity,
+            weights=weights,
+            dates=set(dates),
+            store=store,
+            **kwargs,
+        )
+        values = {**existing_values, **values}
+        self._values = {key: values[key] for key in sorted(values)}
+        return self
+
+    def _transform_values(
+        self,
+        values: Dict[datetime, FactorRiskModel],
+        y: DataFrame,
+        validity: Optional[DataFrame] = None,
+        regressor: Optional[object] = None,
+        start_date: Optional[Timestamp] = None,
+        store: Optional[
+            Callable[[datetime, FactorRiskModel], Optional[RiskModel]]
+        ] = None,
+    ) -> Dict[datetime, RiskModel]:
+        """
+        Transform the risk models and return the transformed risk
+        models keyed by date / time. If store is provided, each
+        transformed risk model is passed to it once completed, and
+        only the returned risk model, if not None, is kept in memory.
+
+        If neither the validity nor a regressor other than the plain
+        WLS is provided, the windows share the same instruments, and
+        the regressions of the windows are stacked and solved in
+        batches by `WLS.fit_batch`, sized by the memory budget of the
+        rolling fit.
+        """
+        transformed_values = {}
+
+        def _store_values(index: datetime, risk_model: Optional[FactorRiskModel]):
+            if risk_model is not None and store is not None:
+                risk_model = store(index, risk_model)
+            if risk_model is not None:
+                transformed_values[index] = risk_model
+
+        indices = [
+            index
+            for index in values.keys()
+            if start_date is None or start_date <= index
+        ]
+        batch_size = 1
+        if validity is None and type(regressor or WLS()) is WLS:
+            batch_size = self._batch_size(
+                n_samples=self._config.window + 1, n_features=y.shape[1]
+            )
+
+        iterator = range(0, len(indices), batch_size)
+        if self._config.show_progress:
+            from tqdm import tqdm
+
+            iterator = tqdm(iterator, leave=False)
+
+        for start in iterator:
+            batch_indices = indices[start : start + batch_size]
+            if batch_size > 1:
+                for index, risk_model in self._transform_batch(
+                    risk_models={index: values[index] for index in batch_indices},
+                    y=y,
+                    regressor=regressor,
+                ).items():
+                    _store_values(index, risk_model)
+                continue
+
+            for index in batch_indices:
+                risk_model = self._transform_value(
+                    risk_model=values[index],
+                    y=y,
+                    validity=validity,
+                    regressor=regressor,
+                    index=index,
+                )
+                _store_values(index, risk_model)
+
+        return transformed_values
+
+    def _transform_batch(
+        self,
+        risk_models: Dict[datetime, FactorRiskModel],
+        y: DataFrame,
+        regressor: Optional[WLS] = None,
+    ) -> Dict[datetime, FactorRiskModel]:
+        """
+        Transform the risk models by a stacked regression of the
+        windows of the instrument returns on their factor returns.
+
+        The risk models without the factor returns of the window, e.g.
+        the summaries, are transformed one by one.
+        """
+        if y.shape[1] == 0:
+            return {}
+
+        transformed_values = {}
+        stacked_models = {}
+        n_factors = None
+        for index, risk_model in risk_models.items():
+            factor_returns = risk_model.factor_returns
+            if (
+                isinstance(factor_returns, DataFrame)
+                and factor_returns.shape[0] == self._config.window + 1
+                and factor_returns.shape[1] == (n_factors or factor_returns.shape[1])
+            ):
+                n_factors = factor_returns.shape[1]
+                stacked_models[index] = risk_model
+                continue
+
+            risk_model = self._transform_value(
+                risk_model=risk_model,
+                y=y,
+                validity=None,
+                regressor=regressor,
+                index=index,
+            )
+            if risk_model is not None:
+                transformed_values[index] = risk_model
+
+        if stacked_models:
+            y_inputs = [
+                self._window_input(y=y, index=index).fillna(0.0)
+                for index in stacked_models
+            ]
+            result = (regressor or WLS()).fit_batch(
+                X=stack(
+                    [model.factor_returns.values for model in stacked_models.values()]
+                ),
+                y=stack([y_input.values for y_input in y_inputs]),
             )
+            for position, (index, risk_model) in enumerate(stacked_models.items()):
+                transformed_values[index] = risk_model._set_transform_result(
+                    y=y_inputs[position],
+                    factor_exposures=result.beta[position],
+                    residual_returns=result.alpha[position],
+                )
+
+        return {
+            index: transformed_values[index]
+            for index in risk_models
+            if index in transformed_values
+        }
+
+    def _transform_value(
+        self,
+        risk_model: FactorRiskModel,
+        y: DataFrame,
+        validity: Optional[DataFrame],
+        regressor: Optional[object],
+        index: Timestamp,
+    ) -> Optional[FactorRiskModel]:
+        """
+        Transform the risk model of the index, or return None if there
+        is no valid instrument in the window.
+        """
+        y_input = self._transform_input(
+            y=self._window_input(y=y, index=index),
+            validity=validity,
+            index=index,
+        )
+
+        # Skip if the number of sample size is zero
+        if y_input.shape[1] == 0:
+            return None
+
+        return risk_model.transform(
+            y=y_input.fillna(0.0),
+            regressor=regressor,
+        )
+
+    def transform_many(
+        self,
+        universes: Dict[Any, Union[DataFrame, Tuple[DataFrame, Optional[DataFrame]]]],
+        regressor: Optional[object] = None,
+        start_date: Optional[Timestamp] = None,
+    ) -> Dict[Any, "RollingFactorRiskModel"]:
+        """
+        Transform the rolling factor risk model into multiple universes.
 
-        values = {}
+        The method walks the dates once. On each date, the windows of
+        the same instrument returns are sliced once, and the factor
+        projection operator is computed once and shared across all the
+        universes. The object itself is not modified.
+
+        Parameters
+        ----------
+        universes : Dict[Any, Union[DataFrame, Tuple[DataFrame, DataFrame]]]
+            The universes keyed by the universe name. Each value is
+            either the instrument returns, or a tuple of the instrument
+            returns and the instrument validity.
+
+        regressor : object, default=None
+            Regressor to transform the input y into factor exposures.
+            If None, the regressor is set to the default WLS.
+
+        start_date : Optional[Timestamp]
+            The first date to transform.
+
+        Returns
+        -------
+        Dict[Any, RollingFactorRiskModel]
+            The transformed rolling factor risk models keyed by the
+            universe name.
+        """
+        inputs = {}
+        for name, universe in universes.items():
+            y, validity = universe if isinstance(universe, tuple) else (universe, None)
+            self._validate_transform_input(y)
+            inputs[name] = (y, validity)
+
+        values = {name: {} for name in inputs}
         iterator = self.keys()
         if self._config.show_progress:
             from tqdm import tqdm
@@ -107,30 +669,78 @@ class RollingFactorRiskModel(RollingRiskModel):
         for index in iterator:
             if start_date is not None and start_date > index:
                 continue
-            y_end_index = y.index.get_loc(index)
-            y_start_index = y_end_index - self._config.window
-            if y_start_index < 0:
-                raise ValueError(
-                    "Input data does not have sufficient history for " f"index {index}"
+
+            # Slice the window of each distinct instrument returns once
+            windows = {}
+            y_inputs = {}
+            for name, (y, validity) in inputs.items():
+                if id(y) not in windows:
+                    windows[id(y)] = self._window_input(y=y, index=index)
+                y_input = self._transform_input(
+                    y=windows[id(y)], validity=validity, index=index
                 )
 
-            y_input = y.iloc[y_start_index : y_end_index + 1]
-            if validity is not None:
-                validity_input = validity.loc[index]
-                y_input = y_input.loc[:, validity_input]
+                # Skip if the number of sample size is zero
+                if y_input.shape[1] == 0:
+                    continue
 
-            # Skip if the number of sample size is zero
-            if y_input.shape[1] == 0:
-                continue
+                y_inputs[name] = y_input.fillna(0.0)
 
-            risk_model = self.get(index)
-            values[index] = risk_model.transform(
-                y=y_input.fillna(0.0),
-                regressor=regressor,
+            risk_models = self.get(index).transform_many(
+                ys=y_inputs, regressor=regressor
             )
+            for name, risk_model in risk_models.items():
+                values[name][index] = risk_model
 
-        self._values = values
-        return self
+        return {
+            name: self.__class__(
+                model=self._model,
+                window=self._config.window,
+                show_progress=self._config.show_progress,
+                values=name_values,
+            )
+            for name, name_values in values.items()
+        }
+
+    def _validate_transform_input(self, y: DataFrame):
+        """
+        Validate the instrument returns and the config to transform.
+        """
+        if not isinstance(y, DataFrame):
+            raise TypeError(
+                "Only DataFrame type is supported, but not " f"{y.__class__.__name__}"
+            )
+
+        if not self._config.window:
+            raise ValueError(
+                f"Rolling timeframe must be specified, but not {self._config.window}"
+            )
+
+    def _window_input(self, y: DataFrame, index: Timestamp) -> DataFrame:
+        """
+        Slice the window of the instrument returns ending at the index.
+        """
+        y_end_index = y.index.get_loc(index)
+        y_start_index = y_end_index - self._config.window
+        if y_start_index < 0:
+            raise ValueError(
+                "Input data does not have sufficient history for " f"index {index}"
+            )
+
+        return y.iloc[y_start_index : y_end_index + 1]
+
+    @staticmethod
+    def _transform_input(
+        y: DataFrame, validity: Optional[DataFrame], index: Timestamp
+    ) -> DataFrame:
+        """
+        Select the valid instruments of the window on the index.
+        """
+        if validity is not None:
+            validity_input = validity.loc[index]
+            y = y.loc[:, validity_input]
+
+        return y
 
     def write_directory(
         self, path: str, format: str = "parquet", workers: int = cpu_count(), **kwargs
@@ -208,3 +818,226 @@ class RollingFactorRiskModel(RollingRiskModel):
             values = pool.map(_frm_read_directory, directories)
 
         return cls(values=dict(values), **metadata)
+
+
+class _DirectoryValues(Mapping):
+    """
+    Factor risk models read lazily from the directories of the keys.
+    """
+
+    def __init__(self, path: str, keys: List[Timestamp], format: str = "parquet"):
+        self._path = path
+        self._keys = keys
+        self._key_set = set(keys)
+        self._format = format
+
+    @property
+    def path(self) -> str:
+        """
+        Return the directory path.
+        """
+        return self._path
+
+    @property
+    def format(self) -> str:
+        """
+        Return the format of the risk models.
+        """
+        return self._format
+
+    def __contains__(self, key: object) -> bool:
+        # Check the keys only without reading the risk model
+        return key in self._key_set
+
+    def __getitem__(self, key: Timestamp) -> FactorRiskModel:
+        if key not in self._key_set:
+            raise KeyError(key)
+
+        return FactorRiskModel.read_directory(
+            join(self._path, _directory_name(key)), format=self._format
+        )
+
+    def __iter__(self) -> Iterator[Timestamp]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+def _directory_name(key: datetime) -> str:
+    """
+    Return the directory name of the key.
+    """
+    if isinstance(key, Timestamp):
+        return key.isoformat()
+    return str(key)
+
+
+def _write_checkpoint(
+    path: str, key: datetime, risk_model: FactorRiskModel, format: str
+) -> None:
+    """
+    Write the risk model of the key into the checkpoint directory.
+    """
+    directory = _directory_name(key)
+    # Write into a temporary directory and rename, so that an
+    # interrupted write is never taken as a checkpoint
+    temp_path = join(path, f".{directory}.tmp")
+    rmtree(temp_path, ignore_errors=True)
+    makedirs(temp_path)
+    risk_model.write_directory(temp_path, format=format)
+    target_path = join(path, directory)
+    if exists(target_path):
+        # A non-empty directory cannot be replaced, so the previous
+        # checkpoint is moved aside first, e.g. in transform
+        previous_path = join(path, f".{directory}.old")
+        rmtree(previous_path, ignore_errors=True)
+        replace(target_path, previous_path)
+        replace(temp_path, target_path)
+        rmtree(previous_path)
+    else:
+        replace(temp_path, target_path)
+
+
+def _write_checkpoint_metadata(
+    path: str, keys: List[Timestamp], parameters: Dict[str, Any]
+) -> None:
+    """
+    Write the metadata of the checkpoints in the directory, same as
+    `write_directory`.
+    """
+    with open(join(path, "metadata.json"), mode="w+") as fp:
+        json.dump(
+            {
+                "directories": [_directory_name(key) for key in keys],
+                "parameters": parameters,
+            },
+            fp,
+        )
+
+
+def _checkpoint_keys(path: str) -> List[Timestamp]:
+    """
+    Return the keys of the completed checkpoints in the directory.
+    """
+    return [
+        Timestamp(name)
+        for name in listdir(path)
+        if not name.startswith(".") and exists(join(path, name, "metadata.json"))
+    ]
+
+
+class _CompactFactorRiskModel:
+    """
+    Compact storage of a factor risk model in a rolling window.
+
+    Only the factor exposures and factor returns are kept. The residual
+    returns are rebuilt from the instrument returns shared by all the
+    windows, i.e. residual_returns = returns - offsets - F @ B, where
+    the offsets are the per-instrument constants, e.g. the means
+    removed in the fit. If the residual returns cannot be rebuilt in
+    such form, they are kept as they are.
+    """
+
+    # Tolerance of the rebuilt residual returns relative to the returns
+    _TOLERANCE = 1e-12
+
+    def __init__(self, risk_model: FactorRiskModel, returns: DataFrame):
+        self.factor_exposures = risk_model.factor_exposures
+        self.factor_returns = risk_model.factor_returns
+        self.config = risk_model.config.dict()
+        self.offsets = None
+        self.residual_returns = risk_model.residual_returns
+        self.residual_index = None
+        self.residual_columns = None
+
+        residual_returns = risk_model.residual_returns
+        if not all(
+            isinstance(value, DataFrame)
+            for value in (self.factor_exposures, self.factor_returns, residual_returns)
+        ):
+            return
+
+        differences = (
+            returns.loc[residual_returns.index, residual_returns.columns].values
+            - self.factor_returns.values @ self.factor_exposures.values
+            - residual_returns.values
+        )
+        offsets = differences[0]
+        scale = max(1.0, float(abs(residual_returns.values).max(initial=0.0)))
+        if allclose(differences, offsets, rtol=0.0, atol=self._TOLERANCE * scale):
+            self.offsets = offsets
+            self.residual_returns = None
+            self.residual_index = residual_returns.index
+            self.residual_columns = residual_returns.columns
+
+    def to_risk_model(self, returns: DataFrame) -> FactorRiskModel:
+        """
+        Rebuild the factor risk model.
+        """
+        residual_returns = self.residual_returns
+        if self.offsets is not None:
+            residual_returns = DataFrame(
+                returns.loc[self.residual_index, self.residual_columns].values
+                - self.offsets
+                - self.factor_returns.values @ self.factor_exposures.values,
+                index=self.residual_index,
+                columns=self.residual_columns,
+            )
+
+        return FactorRiskModel(
+            factor_exposures=self.factor_exposures,
+            factor_returns=self.factor_returns,
+            residual_returns=residual_returns,
+            **self.config,
+        )
+
+
+class _CompactValues(Mapping):
+    """
+    Factor risk models rebuilt lazily from the compact storage.
+    """
+
+    def __init__(
+        self, returns: DataFrame, values: Dict[Timestamp, _CompactFactorRiskModel]
+    ):
+        self._returns = returns
+        self._values = values
+
+    @property
+    def returns(self) -> DataFrame:
+        """
+        Return the instrument returns shared by the windows.
+        """
+        return self._returns
+
+    @property
+    def compact_values(self) -> Dict[Timestamp, _CompactFactorRiskModel]:
+        """
+        Return the compact risk models keyed by date / time.
+        """
+        return self._values
+
+    def __contains__(self, key: object) -> bool:
+        # Check the keys only without rebuilding the risk model
+        return key in self._values
+
+    def __getitem__(self, key: Timestamp) -> FactorRiskModel:
+        return self._values[key].to_risk_model(self._returns)
+
+    def __iter__(self) -> Iterator[Timestamp]:
+        return iter(self._values)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+def _validate_retain(retain: str):
+    """
+    Validate the retain option.
+    """
+    if retain not in ("full", "compact", "summary"):
+        raise ValueError(
+            f'Retain {retain} is not supported. Options are "full", "compact" '
+            'and "summary"'
+        )
@@ -1,11 +1,24 @@
+from contextlib import contextmanager
+from copy import deepcopy
 from datetime import datetime
-from typing import Dict, Iterable, Optional, Tuple
+from multiprocessing import Pool, cpu_count
+from multiprocessing.pool import ThreadPool
+from threading import local
+from typing import Callable, Dict, Iterable, Iterator, Optional, Set, Tuple
 
-from pandas import DataFrame, Timestamp
+from numpy import ascontiguousarray, flatnonzero
+from pandas import DataFrame, Series, Timestamp
 
 from .config import Config
+from .engine import backend, use_backend
 from .risk_model import RiskModel
 
+# Model of each worker in the parallel fit
+_WORKER = local()
+
+# Number of windows sent to a worker at a time in the parallel fit
+_WORKER_CHUNKSIZE = 4
+
 
 class RollingRiskModelConfig(Config):
     """
@@ -104,6 +117,10 @@ class RollingRiskModel:
         X: DataFrame,
         validity: Optional[DataFrame] = None,
         weights: Optional[DataFrame] = None,
+        batch: bool = False,
+        memory_budget: Optional[int] = None,
+        workers: Optional[int] = None,
+        executor: str = "thread",
     ) -> object:
         """
         Fit the model.
@@ -121,13 +138,72 @@ class RollingRiskModel:
             The weights of the instruments, same dimension as the
             instrument returns.
 
+        batch: bool
+            Indicate whether to fit the windows in batches by the
+            method `fit_batch` of the model, e.g. stacked
+            eigendecomposition in PCA. Default is False.
+
+        memory_budget: Optional[int]
+            Memory budget in bytes of each batch, which determines the
+            number of windows in a batch. Only used if batch is True.
+            Default is half of the available physical memory, or 1 GiB
+            if it cannot be determined.
+
+        workers: Optional[int]
+            Number of workers to fit the windows in parallel. Each
+            worker fits its own copy of the model, and the BLAS
+            threads are limited to share the cores among the workers.
+            Default is None, i.e. fitting the windows serially.
+
+        executor: str
+            Executor of the workers. Options are "thread" and
+            "process". Default is "thread". Only used if workers is
+            more than 1.
+
         Returns
         -------
         object
             The object itself.
         """
+        self._values = self._fit_values(
+            X=X,
+            validity=validity,
+            weights=weights,
+            batch=batch,
+            memory_budget=memory_budget,
+            workers=workers,
+            executor=executor,
+        )
+        return self
+
+    def _fit_values(
+        self,
+        X: DataFrame,
+        validity: Optional[DataFrame] = None,
+        weights: Optional[DataFrame] = None,
+        batch: bool = False,
+        memory_budget: Optional[int] = None,
+        workers: Optional[int] = None,
+        executor: str = "thread",
+        dates: Optional[Set[datetime]] = None,
+        store: Optional[Callable[[datetime, RiskModel], Optional[RiskModel]]] = None,
+    ) -> Dict[datetime, RiskModel]:
+        """
+        Fit the windows and return the fitted risk models keyed by
+        date / time. If dates are provided, only the windows ending
+        on the dates are fitted. If store is provided, each fitted
+        risk model is passed to it once completed, and only the
+        returned risk model, if not None, is kept in memory.
+        """
         values = {}
 
+        def _store_values(items: Iterable[Tuple[datetime, RiskModel]]):
+            for index_name, model in items:
+                if store is not None:
+                    model = store(index_name, model)
+                if model is not None:
+                    values[index_name] = model
+
         T = X.shape[0]
         start_index = 0
         if validity is not None:
@@ -142,58 +218,305 @@ class RollingRiskModel:
         if self._config.window is None:
             raise ValueError("The window must be provided in the config.")
 
+        if batch and not hasattr(self._model, "fit_batch"):
+            raise ValueError(
+                f"Model {self._model.__class__.__name__} does not support "
+                "fitting in batches"
+            )
+
+        parallel = workers is not None and workers > 1
+        if parallel and batch:
+            raise ValueError("Fitting in batches does not support multiple workers")
+        elif parallel and executor not in ("thread", "process"):
+            raise ValueError(
+                f"Executor {executor} is not supported. Options are "
+                '"thread" and "process"'
+            )
+
+        batch_size = 1
+        if batch:
+            batch_size = self._batch_size(
+                n_samples=self._config.window + 1,
+                n_features=X.shape[1],
+                memory_budget=memory_budget,
+            )
+
         iterator = range(0, T)
         if self._config.show_progress:
             from tqdm import tqdm
 
             iterator = tqdm(iterator, leave=False)
 
-        try:
+        if not isinstance(X, DataFrame):
+            raise TypeError(f"Invalid type of X {X.__class__.__name__}")
+
+        # Fill the returns once into a contiguous array, so that each
+        # window is a view of its rows without copying
+        X_values = ascontiguousarray(X.fillna(0.0).values)
+        if validity is not None:
+            validity = validity.reindex(columns=X.columns, fill_value=False)
+
+        def _iter_windows() -> Iterator[Tuple[datetime, DataFrame, Optional[Series]]]:
             for index in iterator:
                 start_index = index
                 end_index = index + self._config.window + 1
                 if end_index > T:
                     break
 
-                if isinstance(X, DataFrame):
-                    X_input = X.iloc[start_index:end_index, :]
-                    index_name = X.index[end_index - 1]
-                else:
-                    raise TypeError(f"Invalid type of X {X.__class__.__name__}")
-
-                if weights is None:
-                    weights_input = None
-                elif isinstance(weights, DataFrame):
-                    weights_input = weights.loc[index_name]
-                else:
-                    raise TypeError(
-                        f"Invalid type of weights {weights.__class__.__name__}"
+                index_name = X.index[end_index - 1]
+                if dates is not None and index_name not in dates:
+                    continue
+
+                try:
+                    window_input = self._fit_window_input(
+                        X=X,
+                        X_values=X_values,
+                        start_index=start_index,
+                        end_index=end_index,
+                        validity=validity,
+                        weights=weights,
+                    )
+                except Exception as exc:
+                    raise RuntimeError(
+                        f"Failed to fit at the index {index} due to error: {exc}"
                     )
 
-                if validity is not None:
-                    validity_input = validity.loc[index_name]
-                    X_input = X_input.loc[:, validity_input]
+                if window_input is not None:
+                    yield window_input
 
-                if X_input.shape[1] == 0:
-                    continue
+        # The windows are generated one at a time, so that only the
+        # windows in fitting are held in memory
+        if parallel:
+            _store_values(
+                self._fit_parallel(_iter_windows(), workers=workers, executor=executor)
+            )
+            return values
+
+        batch_inputs = []
+        for window_input in _iter_windows():
+            batch_inputs.append(window_input)
+            if len(batch_inputs) >= batch_size:
+                _store_values(self._fit_inputs(batch_inputs, batch=batch))
+                batch_inputs = []
 
-                params = {}
-                if weights_input is not None:
-                    params["weights"] = weights_input
+        if batch_inputs:
+            _store_values(self._fit_inputs(batch_inputs, batch=batch))
 
-                values[index_name] = self._model.fit(
-                    X=X_input.fillna(0.0), **params
-                ).copy()
+        return values
+
+    def _fit_window_input(
+        self,
+        X: DataFrame,
+        X_values,
+        start_index: int,
+        end_index: int,
+        validity: Optional[DataFrame],
+        weights: Optional[DataFrame],
+    ) -> Optional[Tuple[datetime, DataFrame, Optional[Series]]]:
+        """
+        Return the index name, returns and weights of a window, or None
+        if no instrument is valid in the window.
+        """
+        index_name = X.index[end_index - 1]
+        X_window = X_values[start_index:end_index]
+        columns = X.columns
+
+        if weights is None:
+            weights_input = None
+        elif isinstance(weights, DataFrame):
+            weights_input = weights.loc[index_name]
+        else:
+            raise TypeError(f"Invalid type of weights {weights.__class__.__name__}")
+
+        if validity is not None:
+            validity_input = validity.loc[index_name].values.astype(bool)
+            if not validity_input.all():
+                positions = flatnonzero(validity_input)
+                X_window = X_window[:, positions]
+                columns = columns[positions]
+
+        if X_window.shape[1] == 0:
+            return None
+
+        # Keep the window a view, as pandas >= 3 copies the array by default
+        X_input = DataFrame(
+            X_window,
+            index=X.index[start_index:end_index],
+            columns=columns,
+            copy=False,
+        )
+        return index_name, X_input, weights_input
+
+    def _fit_inputs(
+        self, window_inputs, batch: bool
+    ) -> Iterable[Tuple[datetime, RiskModel]]:
+        """
+        Fit the windows, either in a batch or one by one, in the
+        current process.
+        """
+        try:
+            if batch:
+                return self._fit_batch(window_inputs).items()
+
+            return [
+                (index_name, _fit_window(self._model, index_name, *inputs))
+                for index_name, *inputs in window_inputs
+            ]
         except Exception as exc:
             raise RuntimeError(
-                f"Failed to fit at the index {index} due to error: {exc}"
+                f"Failed to fit at the index {window_inputs[-1][0]} due to "
+                f"error: {exc}"
             )
 
-        self._values = values
-        return self
+    def _fit_parallel(
+        self, window_inputs, workers: int, executor: str
+    ) -> Iterator[Tuple[datetime, RiskModel]]:
+        """
+        Fit the windows in parallel by a pool of workers.
+
+        The windows are consumed lazily by the pool and the results are
+        yielded in the order of the windows once completed. Each window
+        is fitted by a copy of the model as given, so that the results
+        do not depend on the number of workers or the windows fitted
+        before in the same worker. Hence, a warm-started model does not
+        start from the previous window as in the serial fit, and the
+        results may differ from the serial fit within the warm start
+        tolerance. The backend engine of the current context is passed
+        to the workers, as they do not inherit the context of the
+        caller.
+        """
+        blas_threads = max(1, cpu_count() // workers)
+        if executor == "process":
+            # The limit is set in each worker process
+            pool_class = Pool
+            worker_blas_threads = blas_threads
+        else:
+            # The limit is shared by the threads of the current process
+            pool_class = ThreadPool
+            worker_blas_threads = None
+
+        with _limit_blas_threads(blas_threads), pool_class(
+            processes=workers,
+            initializer=_init_worker,
+            initargs=(self._model, worker_blas_threads, backend()),
+        ) as pool:
+            yield from pool.imap(
+                _fit_worker_window, window_inputs, chunksize=_WORKER_CHUNKSIZE
+            )
+
+    def _fit_batch(self, batch_inputs) -> Dict[datetime, RiskModel]:
+        """
+        Fit a batch of windows by the model.
+        """
+        index_names, X_inputs, weights_inputs = zip(*batch_inputs)
+        params = {}
+        if any(weights_input is not None for weights_input in weights_inputs):
+            params["weights"] = list(weights_inputs)
+
+        models = self._model.fit_batch(X=list(X_inputs), **params)
+        return dict(zip(index_names, models))
+
+    @staticmethod
+    def _batch_size(
+        n_samples: int, n_features: int, memory_budget: Optional[int] = None
+    ) -> int:
+        """
+        Return the number of windows in a batch within the memory budget.
+
+        The memory of each window is estimated by the stacked returns,
+        its centred copy, and the stacked covariance or Gram matrix with
+        its eigenvectors, in 64-bit floating points.
+        """
+        if memory_budget is None:
+            try:
+                # Not available in all the platforms, e.g. Windows
+                from os import sysconf
+
+                memory_budget = (
+                    sysconf("SC_AVPHYS_PAGES") * sysconf("SC_PAGE_SIZE") // 2
+                )
+            except (ImportError, ValueError, OSError):
+                memory_budget = 1 << 30
+
+        window_memory = 8 * (
+            2 * n_samples * n_features + 2 * min(n_samples, n_features) ** 2
+        )
+        return max(1, int(memory_budget // window_memory))
 
     def asdict(self):
         """
         Returns a dict representation of the object.
         """
         return self._config.dict()
+
+
+def _fit_window(
+    model: RiskModel,
+    index_name: datetime,
+    X_input: DataFrame,
+    weights_input: Optional[Series],
+) -> RiskModel:
+    """
+    Fit the model on a window and return a copy of the fitted model.
+    """
+    params = {}
+    if weights_input is not None:
+        params["weights"] = weights_input
+
+    return model.fit(X=X_input, **params).copy()
+
+
+def _init_worker(model: RiskModel, blas_threads: Optional[int], library_name: str):
+    """
+    Initialize the worker with its own copy of the model and the
+    backend engine of the caller.
+    """
+    _WORKER.model = deepcopy(model)
+    _WORKER.backend = library_name
+    if blas_threads is not None:
+        # Kept in the worker to hold the limit for the process lifetime
+        _WORKER.blas_limits = _threadpool_limits(blas_threads)
+
+
+def _fit_worker_window(window_input) -> Tuple[datetime, RiskModel]:
+    """
+    Fit a window by a copy of the model of the worker, so that the
+    state left by the previous windows, e.g. a warm start, is not
+    carried over.
+    """
+    index_name, X_input, weights_input = window_input
+    try:
+        with use_backend(_WORKER.backend):
+            model = _fit_window(
+                deepcopy(_WORKER.model), index_name, X_input, weights_input
+            )
+            return index_name, model
+    except Exception as exc:
+        raise RuntimeError(
+            f"Failed to fit at the index {index_name} due to error: {exc}"
+        )
+
+
+def _threadpool_limits(limits: int):
+    """
+    Limit the number of BLAS threads if threadpoolctl is installed.
+    """
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return None
+
+    return threadpool_limits(limits=limits, user_api="blas")
+
+
+@contextmanager
+def _limit_blas_threads(limits: int):
+    """
+    Limit the number of BLAS threads in the context.
+    """
+    blas_limits = _threadpool_limits(limits)
+    try:
+        yield
+    finally:
+        if blas_limits is not None:
+            blas_limits.restore_original_limits()
@@ -4,11 +4,16 @@ from numpy import ndarray
 from pandas import DataFrame
 from sklearn.decomposition import PCA as sklearn_PCA
 
-from ..engine import NumpyEngine
+from ..engine import LinAlgEngine, NumpyEngine
 from ..factor_risk_model import FactorRiskModel
-from ..regressor import WLS
+from .utils import component_signs
 
 np = NumpyEngine()
+linalg = LinAlgEngine()
+
+# Minimum ratio of the number of instruments to the number of time
+# frames to run the T x T Gram eigendecomposition in "auto" solver
+_GRAM_RATIO = 10
 
 
 class APCAConfig(FactorRiskModel.ConfigClass):
@@ -22,10 +27,27 @@ class APCAConfig(FactorRiskModel.ConfigClass):
         Number of components.
     demean : Optional[bool]
         Indicate whether to demean before fitting. Default is True.
+    svd_solver: Optional[str]
+        SVD solver of the decomposition. Options are "auto", "full",
+        "arpack", "randomized" and "gram". The "gram" solver runs the
+        eigendecomposition on the T x T Gram matrix of the returns.
+        Default is "auto", which runs the "gram" solver if the number
+        of instruments is at least 10 times of the number of time
+        frames. Otherwise, it runs the randomized truncated SVD if the
+        input is larger than 500 x 500 and the number of components is
+        less than 80% of the smallest dimension, and the full SVD if not.
+        The signs of the components are normalised in all the solvers,
+        i.e. the largest absolute loading of each instrument projection
+        is positive, so switching the solver does not flip the factors.
+    random_state: Optional[int]
+        Random seed of the "arpack" and "randomized" solvers. Default
+        is None.
     """
 
     n_components: Union[int, float, str]
     demean: Optional[bool] = True
+    svd_solver: Optional[str] = "auto"
+    random_state: Optional[int] = None
 
 
 class APCA(FactorRiskModel):
@@ -39,6 +61,8 @@ class APCA(FactorRiskModel):
         self,
         n_components: int,
         demean: Optional[bool] = True,
+        svd_solver: Optional[str] = "auto",
+        random_state: Optional[int] = None,
         **kwargs,
     ):
         """
@@ -50,9 +74,25 @@ class APCA(FactorRiskModel):
           Number of components.
         demean : Optional[bool]
           Indicate whether to demean before fitting. Default is True.
+        svd_solver: Optional[str]
+          SVD solver of the decomposition. Options are "auto", "full",
+          "arpack", "randomized" and "gram". Default is "auto".
+        random_state: Optional[int]
+          Random seed of the "arpack" and "randomized" solvers. Default
+          is None.
         """
-        super().__init__(n_components=n_components, demean=demean, **kwargs)
-        self._model = sklearn_PCA(n_components=n_components)
+        super().__init__(
+            n_components=n_components,
+            demean=demean,
+            svd_solver=svd_solver,
+            random_state=random_state,
+            **kwargs,
+        )
+        self._model = sklearn_PCA(
+            n_components=n_components,
+            svd_solver="auto" if svd_solver == "gram" else svd_solver,
+            random_state=random_state,
+        )
 
     def fit(
         self,
@@ -90,20 +130,27 @@ class APCA(FactorRiskModel):
         X_fit = X_fit[:, X_reindex]
 
         # Factor model - R = B @ F + residual_returns
-        # Fit with skilearn PCA on the return matrix (T, N) in t-space
-        self._model.fit(X_fit.T)
-        # Eigenvectors
-        U_m = self._model.components_
+        if self._is_gram_solver(X_fit):
+            # Eigendecomposition on the (T, T) Gram matrix in t-space
+            U_m = self._gram_components(X_fit, self._config.n_components)
+        else:
+            # Fit with skilearn PCA on the return matrix (T, N) in t-space
+            self._model.fit(X_fit.T)
+            # Eigenvectors
+            U_m = np.array(self._model.components_)
+            # Normalise the signs by the instrument projections
+            X_centred = X_fit - np.mean(X_fit, axis=1)[:, np.newaxis]
+            U_m = U_m * component_signs(X_centred.T @ U_m.T)[:, np.newaxis]
         # Just choose F = U_m ^T (Shape = (T, n))
         F = U_m.T
 
         # B^T = (F @ F^T)^{-1} @ F @ R^T
         # B = U_m @ R (Shape = (n, N))
         # B = F.T @ scaled_X_fit
-        wls = WLS()
-        wls_result = wls.fit(X=F, y=X_fit)
-        B = wls_result.beta
-        residual_returns = wls_result.alpha
+        # The columns of F are orthonormal, so F^T @ F is an identity
+        # matrix and the regression is an analytic projection
+        B = F.T @ X_fit
+        residual_returns = X_fit - F @ B
 
         # Fill back the instruments which don't have any returns
         # with 0.0 exposures and residual returns
@@ -127,3 +174,42 @@ class APCA(FactorRiskModel):
         self._factor_returns = F
         self._residual_returns = residual_returns
         return self
+
+    def _is_gram_solver(self, X: ndarray) -> bool:
+        """
+        Indicate whether to run the Gram eigendecomposition.
+        """
+        svd_solver = self._config.svd_solver
+        if not isinstance(self._config.n_components, int):
+            return False
+        elif svd_solver == "gram":
+            return True
+        elif svd_solver == "auto":
+            T, N = X.shape
+            return N >= _GRAM_RATIO * T
+
+        return False
+
+    @staticmethod
+    def _gram_components(X: ndarray, n_components: int) -> ndarray:
+        """
+        Return the principal components of the returns in t-space.
+
+        The returns (T, N) are centred across the instruments, and the
+        top eigenvectors of the (T, T) Gram matrix are the same as the
+        principal components of the transposed returns. The cost is
+        O(N T^2 + T^3), instead of decomposing the (N, T) matrix.
+
+        Returns
+        -------
+        ndarray
+          Principal components in dimension (n, T), with the signs
+          normalised same as the other solvers.
+        """
+        X_centred = X - np.mean(X, axis=1)[:, np.newaxis]
+        _, eigenvectors = linalg.eigh(X_centred @ X_centred.T)
+        # Eigenvalues are in ascending order
+        components = eigenvectors[:, ::-1][:, :n_components].T
+        # Normalise the signs by the instrument projections
+        signs = component_signs(X_centred.T @ components.T)
+        return components * signs[:, np.newaxis]
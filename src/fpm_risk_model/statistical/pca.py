@@ -1,14 +1,16 @@
-from typing import Optional, Union
+from typing import List, Optional, Union
 
 from numpy import ndarray
-from pandas import DataFrame, Series
+from pandas import DataFrame, Index, Series
 from sklearn.decomposition import PCA as sklearn_PCA
 
-from ..engine import NumpyEngine
+from ..engine import LinAlgEngine, NumpyEngine
 from ..factor_risk_model import FactorRiskModel
 from ..regressor import WLS
+from .utils import component_signs
 
 np = NumpyEngine()
+linalg = LinAlgEngine()
 
 
 class PCAConfig(FactorRiskModel.ConfigClass):
@@ -25,11 +27,38 @@ class PCAConfig(FactorRiskModel.ConfigClass):
     speedup: Optional[bool]
         Indicate whether to speed up the computation as much as possible.
         Default is True.
+    svd_solver: Optional[str]
+        SVD solver of the decomposition. Options are "auto", "full",
+        "arpack" and "randomized". Default is "auto", which runs the
+        randomized truncated SVD if the input is larger than 500 x 500
+        and the number of components is less than 80% of the smallest
+        dimension, and otherwise the full SVD.
+    random_state: Optional[int]
+        Random seed of the "arpack" and "randomized" solvers. Default
+        is None.
+    warm_start: Optional[bool]
+        Indicate whether to warm start the decomposition from the
+        components of the previous fit by subspace iteration, e.g.
+        in the consecutive windows of a rolling fit. Default is False.
+    warm_start_tol: Optional[float]
+        Tolerance of the relative change of the variance explained by
+        the components between two subspace iterations in the warm
+        start. If the subspace iteration does not converge within the
+        tolerance, the decomposition is refitted in full. Default is
+        1e-6.
+    warm_start_max_iter: Optional[int]
+        Maximum number of subspace iterations in the warm start.
+        Default is 20.
     """
 
     n_components: Union[int, float, str]
     demean: Optional[bool] = True
     speedup: Optional[bool] = True
+    svd_solver: Optional[str] = "auto"
+    random_state: Optional[int] = None
+    warm_start: Optional[bool] = False
+    warm_start_tol: Optional[float] = 1e-6
+    warm_start_max_iter: Optional[int] = 20
 
 
 class PCA(FactorRiskModel):
@@ -44,6 +73,11 @@ class PCA(FactorRiskModel):
         n_components: int,
         demean: Optional[bool] = True,
         speedup: Optional[bool] = True,
+        svd_solver: Optional[str] = "auto",
+        random_state: Optional[int] = None,
+        warm_start: Optional[bool] = False,
+        warm_start_tol: Optional[float] = 1e-6,
+        warm_start_max_iter: Optional[int] = 20,
         **kwargs,
     ):
         """
@@ -58,11 +92,42 @@ class PCA(FactorRiskModel):
         speedup: Optional[bool]
           Indicate whether to speed up the computation as much as possible.
           Default is True.
+        svd_solver: Optional[str]
+          SVD solver of the decomposition. Options are "auto", "full",
+          "arpack" and "randomized". Default is "auto".
+        random_state: Optional[int]
+          Random seed of the "arpack" and "randomized" solvers. Default
+          is None.
+        warm_start: Optional[bool]
+          Indicate whether to warm start the decomposition from the
+          components of the previous fit. Default is False.
+        warm_start_tol: Optional[float]
+          Tolerance of the relative change of the explained variance
+          between two subspace iterations in the warm start. Default
+          is 1e-6.
+        warm_start_max_iter: Optional[int]
+          Maximum number of subspace iterations in the warm start.
+          Default is 20.
         """
         super().__init__(
-            n_components=n_components, demean=demean, speedup=speedup, **kwargs
+            n_components=n_components,
+            demean=demean,
+            speedup=speedup,
+            svd_solver=svd_solver,
+            random_state=random_state,
+            warm_start=warm_start,
+            warm_start_tol=warm_start_tol,
+            warm_start_max_iter=warm_start_max_iter,
+            **kwargs,
         )
-        self._model = sklearn_PCA(n_components=n_components)
+        self._model = sklearn_PCA(
+            n_components=n_components,
+            svd_solver=svd_solver,
+            random_state=random_state,
+        )
+        # Components (N, n) and instruments of the previous fit
+        self._warm_start_components = None
+        self._warm_start_instruments = None
 
     def fit(
         self,
@@ -85,6 +150,136 @@ class PCA(FactorRiskModel):
         object
           The object itself.
         """
+        X_fit, weights_fit, X_reindex = self._prepare_input(X, weights)
+
+        # Dimension (n, N) where n is the number of instruments
+        # Eigenvectors and singular values
+        U_m, singular_values = None, None
+        if self._config.warm_start:
+            instruments = X.columns if isinstance(X, DataFrame) else None
+            if instruments is not None and X_reindex is not None:
+                instruments = instruments[X_reindex]
+            U_m, singular_values = self._warm_start_fit(X_fit, instruments)
+
+        if U_m is None:
+            # Fit with skilearn PCA on the return matrix (T, N)
+            self._model.fit(X_fit)
+            U_m = np.array(self._model.components_)
+            singular_values = np.array(self._model.singular_values_)
+            # Normalise the signs by the time series projections
+            X_centred = X_fit - np.mean(X_fit, axis=0)[np.newaxis, :]
+            U_m = U_m * component_signs(X_centred @ U_m.T)[:, np.newaxis]
+            if self._config.warm_start:
+                self._warm_start_components = U_m.T
+                self._warm_start_instruments = instruments
+
+        return self._fit_factors(
+            X=X,
+            X_fit=X_fit,
+            weights_fit=weights_fit,
+            X_reindex=X_reindex,
+            U_m=U_m,
+            singular_values=singular_values,
+        )
+
+    def fit_batch(
+        self,
+        X: List[Union[ndarray, DataFrame]],
+        weights: Optional[List[Optional[Union[ndarray, Series]]]] = None,
+    ) -> List[FactorRiskModel]:
+        """
+        Fit a batch of returns with the same number of time frames.
+
+        The covariance matrices of all the returns are stacked into a
+        tensor of (B, N, N), or the Gram matrices into (B, T, T) if the
+        number of instruments is greater than the number of time frames,
+        and decomposed by a single stacked eigendecomposition instead of
+        a Python loop of decompositions.
+
+        Parameters
+        ----------
+        X: List[Union[pandas.DataFrame, numpy.ndarray]]
+          List of instrument returns in dimension (T, N_i), where the
+          number of time frames T is same across the batch.
+
+        weights: Optional[List[Optional[Union[ndarray, Series]]]]
+          List of weights of the instruments in dimension (N_i,).
+
+        Returns
+        -------
+        List[FactorRiskModel]
+          Fitted factor risk models in the same order of the returns.
+        """
+        weights = weights or [None] * len(X)
+        if not isinstance(self._config.n_components, int):
+            return [self.fit(X=x, weights=w).copy() for x, w in zip(X, weights)]
+
+        inputs = [self._prepare_input(x, w) for x, w in zip(X, weights)]
+        if len({X_fit.shape[0] for X_fit, _, _ in inputs}) > 1:
+            raise ValueError("The number of time frames must be same in the batch")
+
+        # Pad the returns with zero instruments to stack them, which
+        # are not loaded by any component
+        n_components = self._config.n_components
+        T = inputs[0][0].shape[0]
+        N = max(X_fit.shape[1] for X_fit, _, _ in inputs)
+        X_stack = np.zeros((len(inputs), T, N))
+        for index, (X_fit, _, _) in enumerate(inputs):
+            X_stack[index, :, : X_fit.shape[1]] = X_fit
+        X_stack = X_stack - np.mean(X_stack, axis=1)[:, np.newaxis, :]
+        X_stack_t = np.swapaxes(X_stack, 1, 2)
+
+        if N > T:
+            # Stacked Gram matrices (B, T, T)
+            eigenvalues, U = linalg.eigh(X_stack @ X_stack_t)
+            eigenvalues = eigenvalues[:, ::-1][:, :n_components]
+            U = U[:, :, ::-1][:, :, :n_components]
+            singular_values = np.sqrt(np.maximum(eigenvalues, 0.0))
+            inverse_singular_values = np.where(
+                singular_values > 0.0,
+                1.0 / np.where(singular_values > 0.0, singular_values, 1.0),
+                0.0,
+            )
+            V = (X_stack_t @ U) * inverse_singular_values[:, np.newaxis, :]
+        else:
+            # Stacked covariance matrices (B, N, N)
+            eigenvalues, V = linalg.eigh(X_stack_t @ X_stack)
+            eigenvalues = eigenvalues[:, ::-1][:, :n_components]
+            V = V[:, :, ::-1][:, :, :n_components]
+            singular_values = np.sqrt(np.maximum(eigenvalues, 0.0))
+            U = X_stack @ V
+
+        # Normalise the signs by the time series projections
+        V = V * component_signs(U)[:, np.newaxis, :]
+
+        models = []
+        for index, (X_fit, weights_fit, X_reindex) in enumerate(inputs):
+            model = self._fit_factors(
+                X=X[index],
+                X_fit=X_fit,
+                weights_fit=weights_fit,
+                X_reindex=X_reindex,
+                U_m=V[index, : X_fit.shape[1], :].T,
+                singular_values=singular_values[index],
+            )
+            models.append(model.copy())
+
+        return models
+
+    def _prepare_input(
+        self,
+        X: Union[ndarray, DataFrame],
+        weights: Optional[Union[ndarray, Series]] = None,
+    ):
+        """
+        Prepare the returns and weights to fit.
+
+        Returns
+        -------
+        Tuple[ndarray, Optional[ndarray], Optional[ndarray]]
+          The returns and weights to fit, and the mask of the
+          instruments selected if speedup is enabled.
+        """
         # First convert all the numpy ndarray type first
         X_fit = self._to_numpy(X)
         weights_fit = self._to_numpy(weights)
@@ -95,6 +290,7 @@ class PCA(FactorRiskModel):
             X_fit = np.subtract(X_fit, X_mean)
 
         # Remove the instruments without any returns always
+        X_reindex = None
         if self._config.speedup:
             # Select the instruments of which the returns are not always 0
             X_reindex = ~np.all(np.abs(X_fit) < 1e-20, axis=0)
@@ -102,28 +298,41 @@ class PCA(FactorRiskModel):
             if weights_fit is not None:
                 weights_fit = weights_fit[X_reindex]
 
-        # Fit with skilearn PCA on the return matrix (T, N)
-        self._model.fit(X_fit)
+        return X_fit, weights_fit, X_reindex
+
+    def _fit_factors(
+        self,
+        X: Union[ndarray, DataFrame],
+        X_fit: ndarray,
+        weights_fit: Optional[ndarray],
+        X_reindex: Optional[ndarray],
+        U_m: ndarray,
+        singular_values: ndarray,
+    ) -> object:
+        """
+        Fit the factor exposures, factor returns and residual returns
+        from the principal components.
+        """
         # N is the number of instruments and T is the number of time frames
         T = X.shape[0]
         N = X.shape[1]
-        # Dimension (n, N) where n is the number of instruments
-        # Eigenvectors
-        U_m = np.array(self._model.components_)
         # Exposure matrix (n, N)
-        B = np.multiply(
-            U_m,
-            np.array(self._model.singular_values_ * (T**0.5))[:, np.newaxis],
-        )
+        B = np.multiply(U_m, (singular_values * (T**0.5))[:, np.newaxis])
         # Factor matrix (T, n)
-        wls = WLS()
-        wls_result = wls.fit(X=B.T, y=X_fit.T, weights=weights_fit)
-        F = wls_result.beta.T
-        residual_returns = wls_result.alpha.T
+        if weights_fit is None:
+            # The rows of B are orthogonal, so B @ B^T is diagonal and the
+            # regression is an analytic projection on the components
+            F = self._project(X_fit, B)
+            residual_returns = X_fit - F @ B
+        else:
+            wls = WLS()
+            wls_result = wls.fit(X=B.T, y=X_fit.T, weights=weights_fit)
+            F = wls_result.beta.T
+            residual_returns = wls_result.alpha.T
 
         # Fill back the instruments which don't have any returns
         # with 0.0 exposures and residual returns
-        if self._config.speedup:
+        if X_reindex is not None:
             B_reindex = np.zeros((B.shape[0], N))
             residual_returns_reindex = np.zeros(X.shape)
             B_reindex[:, X_reindex] = B[:, :]
@@ -145,3 +354,110 @@ class PCA(FactorRiskModel):
         self._factor_returns = F
         self._residual_returns = residual_returns
         return self
+
+    @staticmethod
+    def _project(X: ndarray, B: ndarray, rcond: float = 1e-15) -> ndarray:
+        """
+        Project the returns on the exposures with orthogonal rows.
+
+        It is the same as the least squares regression of X^T on B^T,
+        i.e. F^T = (B @ B^T)^{-1} @ B @ X^T, where B @ B^T is a diagonal
+        matrix. Same as the pseudo-inverse, the factors of which the
+        squared norms are below `rcond` of the largest one are zeros.
+
+        Parameters
+        ----------
+        X: ndarray
+          Instrument returns in dimension (T, N).
+        B: ndarray
+          Factor exposures in dimension (n, N) with orthogonal rows.
+
+        Returns
+        -------
+        ndarray
+          Factor returns in dimension (T, n).
+        """
+        norms = np.sum(B * B, axis=1)
+        valid = norms > rcond * np.max(norms)
+        inverse_norms = np.where(valid, 1.0 / np.where(valid, norms, 1.0), 0.0)
+        return (X @ B.T) * inverse_norms[np.newaxis, :]
+
+    def _warm_start_fit(self, X: ndarray, instruments: Optional[Index]):
+        """
+        Fit the principal components by warm-started subspace iteration.
+
+        The components of the previous fit are aligned to the current
+        instruments and used as the initial subspace. Each iteration
+        runs a Rayleigh-Ritz projection on the covariance of the
+        centred returns, costing O(T N n) rather than a full
+        decomposition.
+
+        Parameters
+        ----------
+        X: ndarray
+          Instrument returns in dimension (T, N).
+        instruments: Optional[Index]
+          Instruments of the returns, used to align the previous
+          components. If None, the previous components are used only
+          if the number of instruments is unchanged.
+
+        Returns
+        -------
+        Tuple[Optional[ndarray], Optional[ndarray]]
+          Components in dimension (n, N) and singular values in
+          dimension (n,), or None if the warm start is not available
+          or does not converge.
+        """
+        V = self._warm_start_components
+        n_components = self._config.n_components
+        if V is None or not isinstance(n_components, int):
+            return None, None
+
+        previous_instruments = self._warm_start_instruments
+        if instruments is not None and previous_instruments is not None:
+            V = (
+                DataFrame(V, index=previous_instruments)
+                .reindex(instruments)
+                .fillna(0.0)
+                .values
+            )
+        elif V.shape[0] != X.shape[1]:
+            return None, None
+
+        if V.shape[1] != n_components or V.shape[0] < n_components:
+            return None, None
+
+        X_centred = X - np.mean(X, axis=0)[np.newaxis, :]
+        V, _ = linalg.qr(V)
+        converged = False
+        explained_variance = None
+        for _ in range(self._config.warm_start_max_iter):
+            # Rayleigh-Ritz projection on the subspace
+            XV = X_centred @ V
+            eigenvalues, W = linalg.eigh(XV.T @ XV)
+            # Eigenvalues are in ascending order
+            eigenvalues, W = eigenvalues[::-1], W[:, ::-1]
+            if not bool(np.all(eigenvalues > 0.0)):
+                break
+            V, XV = V @ W, XV @ W
+            # The variance explained by the subspace increases towards
+            # the sum of the top eigenvalues in the iterations
+            previous_explained_variance = explained_variance
+            explained_variance = np.sum(eigenvalues)
+            if previous_explained_variance is not None and bool(
+                explained_variance - previous_explained_variance
+                <= self._config.warm_start_tol * explained_variance
+            ):
+                converged = True
+                break
+            V, _ = linalg.qr(X_centred.T @ XV)
+
+        if not converged:
+            return None, None
+
+        # Normalise the signs by the time series projections
+        V = V * component_signs(XV)[np.newaxis, :]
+
+        self._warm_start_components = V
+        self._warm_start_instruments = instruments
+        return V.T, np.sqrt(eigenvalues)
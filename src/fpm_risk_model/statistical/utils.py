@@ -0,0 +1,32 @@
+from numpy import ndarray
+
+from ..engine import NumpyEngine
+
+np = NumpyEngine()
+
+
+def component_signs(projections: ndarray) -> ndarray:
+    """
+    Return the signs to normalise the principal components.
+
+    The signs are chosen so that the largest absolute entry of each
+    projection on the components is positive, which is deterministic
+    across the solvers and independent of the scikit-learn version.
+    The components with all zero projections keep their signs.
+
+    Parameters
+    ----------
+    projections: ndarray
+      Projections of the samples on the components in dimension
+      (..., S, n), where S is the number of samples and n is the
+      number of components.
+
+    Returns
+    -------
+    ndarray
+      Signs of the components in dimension (..., n).
+    """
+    max_abs_rows = np.argmax(np.abs(projections), axis=-2)
+    max_abs_rows = max_abs_rows[..., np.newaxis, :]
+    signs = np.take_along_axis(projections, max_abs_rows, axis=-2)[..., 0, :]
+    return np.where(signs < 0.0, -1.0, 1.0)
@@ -76,3 +76,13 @@ def rolling_factor_risk_model(daily_returns):
         show_progress=False,
     )
     return rolling_model.fit(X=daily_returns)
+
+
+@pytest.fixture(scope="module")
+def rolling_factor_risk_model_summary(daily_returns):
+    rolling_model = RollingFactorRiskModel(
+        model=PCA(n_components=2, demean=True, speedup=True),
+        window=5,
+        show_progress=False,
+    )
+    return rolling_model.fit(X=daily_returns, retain="summary", cov_halflife=3)
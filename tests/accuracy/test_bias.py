@@ -1,3 +1,4 @@
+import pytest
 from numpy import array, nan
 from pandas import Series
 from pandas.testing import assert_series_equal
@@ -67,3 +68,27 @@ def test_compute_bias_statistics_dict(
         index=weights.index,
     )
     assert_series_equal(expected_bias_statistics, bias_statistics)
+
+
+def test_compute_standardized_returns_summary(
+    daily_returns, weights, rolling_factor_risk_model, rolling_factor_risk_model_summary
+):
+    standardized_returns = compute_standardized_returns(
+        X=daily_returns,
+        weights=weights,
+        rolling_risk_model=rolling_factor_risk_model_summary,
+        cov_halflife=3,
+    )
+    expected_standardized_returns = compute_standardized_returns(
+        X=daily_returns,
+        weights=weights,
+        rolling_risk_model=rolling_factor_risk_model,
+        cov_halflife=3,
+    )
+    assert_series_equal(standardized_returns, expected_standardized_returns)
+    with pytest.raises(ValueError, match="summarized with halflife"):
+        compute_standardized_returns(
+            X=daily_returns,
+            weights=weights,
+            rolling_risk_model=rolling_factor_risk_model_summary,
+        )
@@ -1,3 +1,4 @@
+import pytest
 from numpy import array, nan
 from pandas import Series
 from pandas.testing import assert_series_equal
@@ -83,3 +84,24 @@ def test_compute_value_at_risk_rolling_breach_statistics(
     assert_series_equal(
         var_rolling_breach_statistics, expected_var_rolling_breach_statistics
     )
+
+
+def test_compute_value_at_risk_threshold_summary(
+    weights, rolling_factor_risk_model, rolling_factor_risk_model_summary
+):
+    var_threshold = compute_value_at_risk_threshold(
+        weights=weights,
+        rolling_risk_model=rolling_factor_risk_model_summary,
+        cov_halflife=3,
+    )
+    expected_var_threshold = compute_value_at_risk_threshold(
+        weights=weights,
+        rolling_risk_model=rolling_factor_risk_model,
+        cov_halflife=3,
+    )
+    assert_series_equal(var_threshold, expected_var_threshold)
+    with pytest.raises(ValueError, match="summarized with halflife"):
+        compute_value_at_risk_threshold(
+            weights=weights,
+            rolling_risk_model=rolling_factor_risk_model_summary,
+        )
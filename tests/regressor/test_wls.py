@@ -1,5 +1,6 @@
 import pytest
 from numpy import array
+from numpy.random import default_rng
 from numpy.testing import assert_almost_equal
 
 from fpm_risk_model.regressor.wls import WLS
@@ -41,8 +42,9 @@ def y():
     )
 
 
-def test_wls(X, y):
-    regressor = WLS()
+@pytest.mark.parametrize("executor", ["closed", "lstsq", "auto"])
+def test_wls(X, y, executor):
+    regressor = WLS(executor=executor)
     result = regressor.fit(X=X, y=y)
     expected_alpha = array(
         [
@@ -69,3 +71,77 @@ def test_wls(X, y):
 
     assert_almost_equal(result.alpha, expected_alpha)
     assert_almost_equal(result.beta, expected_beta)
+
+
+@pytest.mark.parametrize("executor", ["cholesky", "qr", "lstsq", "auto"])
+@pytest.mark.parametrize("weighted", [False, True])
+def test_wls_executors(X, y, executor, weighted):
+    # Remove the zero column to make the system full rank
+    X_full_rank = X[:, [0, 1, 3]]
+    weights = array([1.0, 2.0, 0.5, 1.5, 1.0, 0.8, 1.2, 2.0, 0.3, 1.0])
+    weights = weights if weighted else None
+    expected = WLS(executor="closed").fit(X=X_full_rank, y=y, weights=weights)
+    result = WLS(executor=executor).fit(X=X_full_rank, y=y, weights=weights)
+    assert_almost_equal(result.alpha, expected.alpha)
+    assert_almost_equal(result.beta, expected.beta)
+
+
+@pytest.mark.parametrize("weighted", [False, True])
+def test_wls_lstsq_rank_deficient(X, y, weighted):
+    from numpy import sqrt
+    from numpy.linalg import pinv
+
+    # The last column is collinear with the first one
+    X_rank_deficient = X[:, [0, 1, 3, 0]] * array([1.0, 1.0, 1.0, 2.0])
+    weights = array([1.0, 2.0, 0.5, 1.5, 1.0, 0.8, 1.2, 2.0, 0.3, 1.0])
+    weights = weights if weighted else None
+    result = WLS(executor="lstsq").fit(X=X_rank_deficient, y=y, weights=weights)
+    sqrt_weights = 1.0 if weights is None else sqrt(weights)[:, None]
+    # Minimum norm solution of the weighted least squares
+    expected_beta = pinv(X_rank_deficient * sqrt_weights) @ (y * sqrt_weights)
+    assert_almost_equal(result.beta, expected_beta)
+    assert_almost_equal(result.alpha, y - X_rank_deficient @ expected_beta)
+
+
+def test_wls_invalid_executor():
+    with pytest.raises(ValueError):
+        WLS(executor="unknown")
+
+
+@pytest.mark.parametrize("executor", ["closed", "cholesky", "qr", "lstsq", "auto"])
+@pytest.mark.parametrize("weighted", [False, True])
+def test_wls_fit_batch(executor, weighted):
+    rng = default_rng(0)
+    X = rng.standard_normal((4, 20, 3))
+    y = rng.standard_normal((4, 20, 5))
+    weights = rng.uniform(0.5, 1.5, (4, 20)) if weighted else None
+    regressor = WLS(executor=executor)
+    result = regressor.fit_batch(X=X, y=y, weights=weights)
+    assert result.alpha.shape == (4, 20, 5)
+    assert result.beta.shape == (4, 3, 5)
+    for index in range(X.shape[0]):
+        expected = regressor.fit(
+            X=X[index],
+            y=y[index],
+            weights=None if weights is None else weights[index],
+        )
+        assert_almost_equal(result.alpha[index], expected.alpha)
+        assert_almost_equal(result.beta[index], expected.beta)
+
+
+def test_wls_fit_batch_invalid_dimension(X, y):
+    with pytest.raises(ValueError):
+        WLS().fit_batch(X=X, y=y)
+    with pytest.raises(ValueError):
+        WLS().fit_batch(X=X[None, :, :], y=y[None, :5, :])
+
+
+@pytest.mark.parametrize("executor", ["closed", "cholesky", "qr", "lstsq", "auto"])
+def test_wls_projection(X, y, executor):
+    X_full_rank = X[:, [0, 1, 3]]
+    weights = array([1.0, 2.0, 0.5, 1.5, 1.0, 0.8, 1.2, 2.0, 0.3, 1.0])
+    regressor = WLS(executor=executor)
+    projection = regressor.projection(X=X_full_rank, weights=weights)
+    expected = regressor.fit(X=X_full_rank, y=y, weights=weights)
+    assert projection.shape == (3, 10)
+    assert_almost_equal(projection @ y, expected.beta)
@@ -104,3 +104,57 @@ def test_apca_pd(
             index=dates,
         ),
     )
+
+
+@pytest.mark.parametrize("svd_solver", ["arpack", "randomized"])
+def test_apca_svd_solver(daily_returns_np, svd_solver):
+    expected_apca = APCA(n_components=1, svd_solver="full").fit(X=daily_returns_np)
+    apca = APCA(n_components=1, svd_solver=svd_solver, random_state=0)
+    apca.fit(X=daily_returns_np)
+    assert apca.config.svd_solver == svd_solver
+    np.testing.assert_almost_equal(apca.cov(), expected_apca.cov())
+    np.testing.assert_almost_equal(
+        apca.residual_returns, expected_apca.residual_returns
+    )
+
+
+def test_apca_gram_solver(
+    daily_returns_np,
+    expected_factor_exposures,
+    expected_factor_returns,
+    expected_residual_returns,
+):
+    apca = APCA(n_components=1, demean=True, svd_solver="gram")
+    apca.fit(X=daily_returns_np)
+    np.testing.assert_almost_equal(apca.factor_exposures, expected_factor_exposures)
+    np.testing.assert_almost_equal(apca.factor_returns, expected_factor_returns)
+    np.testing.assert_almost_equal(apca.residual_returns, expected_residual_returns)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_apca_auto_gram_solver(seed):
+    # The number of instruments is much greater than the number of time frames
+    # and the factor signs must agree across the solvers
+    rng = np.random.default_rng(seed)
+    returns = rng.standard_normal((20, 400)) * rng.uniform(0.01, 0.03, 400)
+    expected_apca = APCA(n_components=3, svd_solver="full").fit(X=returns)
+    apca = APCA(n_components=3, svd_solver="auto").fit(X=returns)
+    np.testing.assert_almost_equal(apca.factor_returns, expected_apca.factor_returns)
+    np.testing.assert_almost_equal(
+        apca.factor_exposures, expected_apca.factor_exposures
+    )
+    np.testing.assert_almost_equal(
+        apca.residual_returns, expected_apca.residual_returns
+    )
+
+
+@pytest.mark.parametrize("n_components", [1, 3])
+def test_apca_projection_same_as_regression(daily_returns_np, n_components):
+    from fpm_risk_model.regressor import WLS
+
+    apca = APCA(n_components=n_components, demean=True)
+    apca.fit(X=daily_returns_np)
+    X_fit = daily_returns_np - daily_returns_np.mean(axis=0)
+    expected = WLS().fit(X=apca.factor_returns, y=X_fit)
+    np.testing.assert_almost_equal(apca.factor_exposures, expected.beta, decimal=10)
+    np.testing.assert_almost_equal(apca.residual_returns, expected.alpha, decimal=10)
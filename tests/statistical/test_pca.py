@@ -211,3 +211,111 @@ def test_pca_same_covariances(
         expected_covariances,
         factor_risk_model.cov().fillna(0.0),
     )
+
+
+@pytest.mark.parametrize("svd_solver", ["arpack", "randomized"])
+def test_pca_svd_solver(daily_returns_np, svd_solver):
+    expected_pca = PCA(n_components=2, svd_solver="full").fit(X=daily_returns_np)
+    pca = PCA(n_components=2, svd_solver=svd_solver, random_state=0)
+    pca.fit(X=daily_returns_np)
+    assert pca.config.svd_solver == svd_solver
+    np.testing.assert_almost_equal(pca.cov(), expected_pca.cov())
+    np.testing.assert_almost_equal(pca.residual_returns, expected_pca.residual_returns)
+
+
+@pytest.mark.parametrize("n_components", [2, 3])
+def test_pca_projection_same_as_regression(daily_returns_np, n_components):
+    from fpm_risk_model.regressor import WLS
+
+    pca = PCA(n_components=n_components, demean=True, speedup=False)
+    pca.fit(X=daily_returns_np)
+    X_fit = daily_returns_np - daily_returns_np.mean(axis=0)
+    expected = WLS().fit(X=pca.factor_exposures.T, y=X_fit.T)
+    np.testing.assert_almost_equal(pca.factor_returns, expected.beta.T, decimal=10)
+    np.testing.assert_almost_equal(pca.residual_returns, expected.alpha.T, decimal=10)
+
+
+@pytest.mark.parametrize("warm_start_max_iter", [0, 10])
+def test_pca_warm_start(warm_start_max_iter):
+    rng = np.random.default_rng(0)
+    factor_returns = rng.standard_normal((61, 3)) * array([0.05, 0.03, 0.02])
+    returns = factor_returns @ rng.standard_normal((3, 50))
+    returns += rng.standard_normal((61, 50)) * 0.01
+    returns = pd.DataFrame(returns, columns=[f"instrument_{i}" for i in range(50)])
+
+    pca = PCA(
+        n_components=3,
+        warm_start=True,
+        warm_start_tol=1e-12,
+        warm_start_max_iter=warm_start_max_iter,
+    )
+    # The second window drops an instrument and shifts by one time frame
+    pca.fit(X=returns.iloc[:60])
+    warm_start_window = returns.iloc[1:61, 1:]
+    pca.fit(X=warm_start_window)
+    expected_pca = PCA(n_components=3).fit(X=warm_start_window)
+    pd.testing.assert_frame_equal(
+        pca.factor_exposures, expected_pca.factor_exposures, atol=1e-6
+    )
+    pd.testing.assert_frame_equal(
+        pca.factor_returns, expected_pca.factor_returns, atol=1e-6
+    )
+    pd.testing.assert_frame_equal(pca.cov(), expected_pca.cov(), atol=1e-10)
+
+
+def test_pca_warm_start_fallback_rate():
+    # More components than the true factors, of which the noise components
+    # have nearly equal eigenvalues
+    rng = np.random.default_rng(0)
+    factor_returns = rng.standard_normal((160, 3)) * array([0.05, 0.03, 0.02])
+    returns = factor_returns @ rng.standard_normal((3, 100))
+    returns += rng.standard_normal((160, 100)) * 0.01
+    returns = pd.DataFrame(returns)
+
+    pca = PCA(n_components=10, warm_start=True)
+    n_fallbacks = 0
+    model_fit = pca._model.fit
+
+    def _count_fit(X):
+        nonlocal n_fallbacks
+        n_fallbacks += 1
+        return model_fit(X)
+
+    pca._model.fit = _count_fit
+    for start in range(40):
+        window = returns.iloc[start : start + 120]
+        pca.fit(X=window)
+        expected_cov = PCA(n_components=10).fit(X=window).cov()
+        pd.testing.assert_frame_equal(
+            pca.cov(), expected_cov, atol=1e-2 * np.max(np.abs(expected_cov.values))
+        )
+
+    # The first window is always fitted in full, and almost all of the
+    # following windows converge in the warm start
+    assert n_fallbacks <= 4
+
+
+@pytest.mark.parametrize("n_instruments", [8, 40])
+@pytest.mark.parametrize("weighted", [False, True])
+def test_pca_fit_batch(n_instruments, weighted):
+    rng = np.random.default_rng(0)
+    returns = rng.standard_normal((20, n_instruments)) * 0.02
+    # Different instruments and the same number of time frames in the batch
+    X = [returns[:10, :], returns[5:15, 1:], returns[10:20, 2:]]
+    weights = [rng.uniform(1.0, 2.0, x.shape[1]) for x in X] if weighted else None
+    pca = PCA(n_components=2)
+    models = pca.fit_batch(X=X, weights=weights)
+    assert len(models) == len(X)
+    for index, model in enumerate(models):
+        expected_pca = PCA(n_components=2).fit(
+            X=X[index], weights=None if weights is None else weights[index]
+        )
+        np.testing.assert_almost_equal(
+            model.factor_exposures, expected_pca.factor_exposures
+        )
+        np.testing.assert_almost_equal(
+            model.factor_returns, expected_pca.factor_returns
+        )
+        np.testing.assert_almost_equal(
+            model.residual_returns, expected_pca.residual_returns
+        )
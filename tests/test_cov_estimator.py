@@ -135,3 +135,20 @@ def test_cov_estimator_vol_adj(factor_risk_model, instruments):
         cov,
         target_cov,
     )
+
+
+def test_cov_estimator_instruments(factor_risk_model, instruments, valid_instruments):
+    cov_estimator = CovarianceEstimator(factor_risk_model)
+    sub_instruments = valid_instruments[:2]
+    assert_frame_equal(
+        cov_estimator.cov(instruments=sub_instruments),
+        cov_estimator.cov().loc[sub_instruments, sub_instruments],
+    )
+
+    vol = Series(0.2, index=instruments)
+    assert_frame_equal(
+        cov_estimator.cov(volatility=vol, instruments=sub_instruments),
+        cov_estimator.cov(volatility=vol, strict=False).loc[
+            sub_instruments, sub_instruments
+        ],
+    )
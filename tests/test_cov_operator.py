@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from fpm_risk_model import FactorCovarianceOperator
+from fpm_risk_model.factor_risk_model import FactorRiskModel
+
+
+@pytest.fixture(scope="module")
+def instruments():
+    return pd.Index([f"instrument_{index}" for index in range(6)])
+
+
+@pytest.fixture(scope="module")
+def factor_risk_model(instruments):
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2016-01-04", periods=20)
+    factors = ["factor_1", "factor_2"]
+    factor_exposures = rng.standard_normal((2, 6))
+    residual_returns = rng.standard_normal((20, 6)) * 0.01
+    # The last instrument has no exposures and residual returns
+    factor_exposures[:, -1] = 0.0
+    residual_returns[:, -1] = 0.0
+    return FactorRiskModel(
+        factor_exposures=pd.DataFrame(
+            factor_exposures, index=factors, columns=instruments
+        ),
+        factor_returns=pd.DataFrame(
+            rng.standard_normal((20, 2)) * 0.02, index=dates, columns=factors
+        ),
+        residual_returns=pd.DataFrame(
+            residual_returns, index=dates, columns=instruments
+        ),
+    )
+
+
+def test_cov_operator_to_dense(factor_risk_model, instruments):
+    operator = factor_risk_model.cov_operator(halflife=10)
+    assert isinstance(operator, FactorCovarianceOperator)
+    assert operator.shape == (5, 5)
+    pd.testing.assert_frame_equal(
+        operator.to_dense(), factor_risk_model.cov(halflife=10)
+    )
+    pd.testing.assert_series_equal(
+        operator.diag(),
+        pd.Series(np.diag(factor_risk_model.cov(halflife=10)), instruments[:5]),
+    )
+
+
+def test_cov_operator_matvec_quad_form(factor_risk_model, instruments):
+    rng = np.random.default_rng(1)
+    operator = factor_risk_model.cov_operator()
+    cov = factor_risk_model.cov().values
+    x = rng.standard_normal(5)
+    X = rng.standard_normal((5, 3))
+    np.testing.assert_almost_equal(operator.matvec(x), cov @ x)
+    np.testing.assert_almost_equal(operator.matvec(X), cov @ X)
+    np.testing.assert_almost_equal(operator.quad_form(x), x @ cov @ x)
+    np.testing.assert_almost_equal(
+        operator.quad_form(X.T), np.einsum("pi,ij,pj->p", X.T, cov, X.T)
+    )
+
+    # Pandas inputs are aligned with the instruments
+    weights = pd.Series(x, index=instruments[:5])[::-1]
+    pd.testing.assert_series_equal(
+        operator.matvec(weights), pd.Series(cov @ x, index=instruments[:5])
+    )
+
+    # Only the missing instruments are filled with zero weights
+    weights = pd.Series(x[:4], index=instruments[:4])
+    assert operator.quad_form(weights) == pytest.approx(x[:4] @ cov[:4, :4] @ x[:4])
+    weights = pd.Series(x.copy(), index=instruments[:5])
+    weights.iloc[0] = np.nan
+    assert np.isnan(operator.quad_form(weights))
+    weights = pd.DataFrame([x, x], columns=instruments[:5])
+    weights.iloc[1, 0] = np.nan
+    variances = operator.quad_form(weights)
+    assert not np.isnan(variances.iloc[0])
+    assert np.isnan(variances.iloc[1])
+
+
+def test_cov_operator_submatrix(factor_risk_model, instruments):
+    operator = factor_risk_model.cov_operator()
+    sub_instruments = [instruments[3], instruments[1]]
+    submatrix = operator.submatrix(sub_instruments)
+    pd.testing.assert_frame_equal(
+        submatrix.to_dense(),
+        factor_risk_model.cov().loc[sub_instruments, sub_instruments],
+    )
+    with pytest.raises(KeyError):
+        operator.submatrix(["unknown"])
+
+
+def test_cov_operator_show_all_instruments(factor_risk_model):
+    model = factor_risk_model.copy()
+    model.config.show_all_instruments = True
+    pd.testing.assert_frame_equal(model.cov_operator().to_dense(), model.cov())
+
+
+def test_cov_operator_inv_solve(factor_risk_model, instruments):
+    rng = np.random.default_rng(2)
+    cov = factor_risk_model.cov(halflife=10)
+    inv_operator = factor_risk_model.inv_operator(halflife=10)
+    np.testing.assert_allclose(
+        inv_operator.to_dense().values, np.linalg.inv(cov.values), rtol=1e-8
+    )
+
+    X = rng.standard_normal((5, 3))
+    np.testing.assert_allclose(
+        factor_risk_model.solve(X, halflife=10),
+        np.linalg.solve(cov.values, X),
+        rtol=1e-8,
+    )
+    x = pd.Series(X[:, 0], index=instruments[:5])
+    pd.testing.assert_series_equal(
+        factor_risk_model.solve(x, halflife=10),
+        pd.Series(np.linalg.solve(cov.values, X[:, 0]), index=instruments[:5]),
+    )
+
+
+def test_cov_operator_inv_zero_specific_variances():
+    operator = FactorCovarianceOperator(
+        factor_exposures=np.ones((1, 2)),
+        factor_covariances=np.eye(1),
+        specific_variances=np.array([1.0, 0.0]),
+    )
+    with pytest.raises(ValueError):
+        operator.inv()
@@ -20,3 +20,44 @@ def test_numpy_engine():
         cov = demean.T @ demean
         invcov = linalg.inv(cov)
         assert isinstance(invcov, np.ndarray)
+
+
+def test_engine_module_cache():
+    import numpy
+
+    from fpm_risk_model import engine
+
+    np = NumpyEngine()
+    linalg = LinAlgEngine()
+    assert np.mean is numpy.mean
+    assert linalg.pinv is numpy.linalg.pinv
+    assert engine._NUMPY_MODULES["numpy"] is numpy
+    assert engine._LINALG_MODULES["numpy"] is numpy.linalg
+
+    # Switching the backend in the context keeps the shared cache
+    with use_backend("numpy"):
+        assert engine._NUMPY_MODULES["numpy"] is numpy
+        assert np.mean is numpy.mean
+
+    assert engine._LINALG_MODULES["numpy"] is numpy.linalg
+
+
+def test_use_backend_context_local():
+    from concurrent.futures import ThreadPoolExecutor
+    from threading import Barrier
+
+    barrier = Barrier(2)
+
+    def _select(library_name):
+        with use_backend(library_name):
+            # Both threads are inside the context manager at the same time
+            barrier.wait(timeout=5)
+            selected = backend()
+            barrier.wait(timeout=5)
+        return selected
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        selected = list(executor.map(_select, ["numpy", "tensorflow"]))
+
+    assert selected == ["numpy", "tensorflow"]
+    assert backend() == "numpy"
@@ -7,6 +7,7 @@ from numpy import array
 from pandas import DataFrame
 
 from fpm_risk_model.factor_risk_model import FactorRiskModel
+from fpm_risk_model.factor_risk_model_summary import FactorRiskModelSummary
 
 
 @pytest.fixture(scope="module")
@@ -206,6 +207,25 @@ def test_factor_risk_model_pd_correlations(
     pd.testing.assert_frame_equal(corr, expected_correlations)
 
 
+def test_factor_risk_model_pd_correlations_read_only(
+    factor_risk_model_pd, expected_correlations, valid_instruments
+):
+    # The covariance values can be read-only, e.g. under copy-on-write
+    model = factor_risk_model_pd.copy()
+    cov = model.cov()
+    values = cov.values.copy()
+    values.flags.writeable = False
+    model.cov = lambda **kwargs: pd.DataFrame(
+        values, index=cov.index, columns=cov.columns, copy=False
+    )
+    corr = model.corr()
+    expected_correlations = pd.DataFrame(
+        expected_correlations, index=valid_instruments, columns=valid_instruments
+    )
+    pd.testing.assert_frame_equal(corr, expected_correlations)
+    pd.testing.assert_frame_equal(model.cov(), cov)
+
+
 def test_factor_risk_model_pd_covariances_halflife(
     factor_risk_model_pd, expected_covariances_halflife, valid_instruments
 ):
@@ -233,6 +253,170 @@ def test_factor_risk_model_pd_correlations_halflife(
     pd.testing.assert_frame_equal(corr, expected_corr)
 
 
+def test_factor_risk_model_np_portfolio_variance(factor_risk_model_np):
+    weights = np.random.default_rng(0).standard_normal((5, 4))
+    model = factor_risk_model_np.copy()
+    model.config.show_all_instruments = True
+    cov = np.nan_to_num(model.cov(halflife=10))
+    variances = factor_risk_model_np.portfolio_variance(weights, halflife=10)
+    np.testing.assert_allclose(
+        variances, np.einsum("pi,ij,pj->p", weights, cov, weights)
+    )
+    np.testing.assert_allclose(
+        factor_risk_model_np.portfolio_variance(weights[0], halflife=10),
+        weights[0] @ cov @ weights[0],
+    )
+
+
+def test_factor_risk_model_pd_portfolio_variance(
+    factor_risk_model_pd, valid_instruments
+):
+    weights = pd.DataFrame(
+        [[0.5, 0.5, 0.0], [0.6, 0.2, 0.2]],
+        index=["portfolio_1", "portfolio_2"],
+        columns=valid_instruments,
+    )
+    cov = factor_risk_model_pd.cov()
+    variances = factor_risk_model_pd.portfolio_variance(weights)
+    pd.testing.assert_series_equal(
+        variances,
+        pd.Series(
+            np.einsum("pi,ij,pj->p", weights.values, cov.values, weights.values),
+            index=weights.index,
+        ),
+    )
+    assert factor_risk_model_pd.portfolio_variance(weights.iloc[1]) == pytest.approx(
+        variances.iloc[1]
+    )
+
+
+def test_factor_risk_model_cov_cache(
+    factor_exposures, factor_returns, residual_returns, daily_returns_np
+):
+    model = FactorRiskModel(
+        factor_exposures=factor_exposures,
+        factor_returns=factor_returns,
+        residual_returns=residual_returns,
+        cov_cache_size=2,
+    )
+    components = model._cov_components(halflife=10)
+    assert model._cov_components(halflife=10) is components
+    np.testing.assert_allclose(model.cov(halflife=10), model.copy().cov(halflife=10))
+
+    # The least recently used entry is evicted
+    model._cov_components()
+    model._cov_components(halflife=5)
+    assert list(model._cov_cache) == [(None, 1), (5, 1)]
+
+    # The cache is invalidated by transform
+    model.transform(daily_returns_np)
+    assert len(model._cov_cache) == 0
+    assert model._cov_components(halflife=10) is not components
+
+    # The cache is disabled if the size is zero
+    model.config.cov_cache_size = 0
+    assert model._cov_components() is not model._cov_components()
+    assert len(model._cov_cache) == 0
+
+
+@pytest.mark.parametrize("halflife", [None, 10])
+def test_factor_risk_model_specific_variances(halflife):
+    rng = np.random.default_rng(0)
+    T, N = 50, 6
+    residual_returns = rng.standard_normal((T, N)) * 0.01
+    residual_returns[:, 2] = 0.0
+    weights = None
+    if halflife is not None:
+        weights = np.array([2 ** (-(T - 1 - t) / halflife) for t in range(0, T)])
+
+    model = FactorRiskModel(residual_returns=residual_returns)
+    variances = model.specific_variances(weights=weights, ddof=1)
+
+    w = np.ones(T) if weights is None else weights
+    r_mean = np.mean(residual_returns * w[:, np.newaxis], axis=0)
+    expected = np.sum(w[:, np.newaxis] * (residual_returns - r_mean) ** 2, axis=0)
+    np.testing.assert_allclose(variances, expected / (T - 1), rtol=1e-10)
+    assert variances[2] == 0.0
+
+
+def test_factor_risk_model_cov_grid(factor_risk_model_np, factor_risk_model_pd):
+    halflives = [None, 5, 10, 5]
+    covs = factor_risk_model_pd.cov_grid(halflives=halflives)
+    assert list(covs) == [None, 5, 10]
+    for halflife, cov in covs.items():
+        pd.testing.assert_frame_equal(cov, factor_risk_model_pd.cov(halflife=halflife))
+
+    covs = factor_risk_model_np.cov_grid(halflives=[20, 10])
+    for halflife, cov in covs.items():
+        np.testing.assert_allclose(cov, factor_risk_model_np.cov(halflife=halflife))
+
+
+def test_factor_risk_model_vol(factor_risk_model_np, factor_risk_model_pd):
+    cov = factor_risk_model_pd.cov(halflife=10)
+    pd.testing.assert_series_equal(
+        factor_risk_model_pd.vol(halflife=10),
+        pd.Series(np.sqrt(np.diag(cov)), index=cov.index),
+    )
+    np.testing.assert_allclose(
+        factor_risk_model_np.vol(), np.sqrt(np.diag(factor_risk_model_np.cov()))
+    )
+
+    model = factor_risk_model_np.copy()
+    model.config.show_all_instruments = True
+    np.testing.assert_allclose(model.vol(), np.sqrt(np.diag(model.cov())))
+
+
+def test_factor_risk_model_cov_instruments(factor_risk_model_np, factor_risk_model_pd):
+    instruments = ["AAPL", "A"]
+    pd.testing.assert_frame_equal(
+        factor_risk_model_pd.cov(halflife=10, instruments=instruments),
+        factor_risk_model_pd.cov(halflife=10).loc[instruments, instruments],
+    )
+    with pytest.raises(KeyError):
+        factor_risk_model_pd.cov(instruments=["UNKNOWN"])
+
+    model = factor_risk_model_np.copy()
+    model.config.show_all_instruments = True
+    np.testing.assert_allclose(
+        factor_risk_model_np.cov(instruments=[3, 0]),
+        model.cov()[np.ix_([3, 0], [3, 0])],
+    )
+
+
+def test_factor_risk_model_summary(factor_risk_model_np, factor_risk_model_pd):
+    summary = FactorRiskModelSummary.from_risk_model(factor_risk_model_pd, halflife=10)
+    assert summary.factor_returns is None
+    assert summary.residual_returns is None
+    pd.testing.assert_frame_equal(
+        summary.cov(halflife=10), factor_risk_model_pd.cov(halflife=10)
+    )
+    pd.testing.assert_series_equal(
+        summary.vol(halflife=10), factor_risk_model_pd.vol(halflife=10)
+    )
+    pd.testing.assert_series_equal(
+        summary.specific_variances(halflife=10),
+        pd.Series(
+            factor_risk_model_pd._cov_components(halflife=10)[2],
+            index=factor_risk_model_pd.factor_exposures.columns,
+        ),
+    )
+    with pytest.raises(ValueError):
+        summary.cov()
+    with pytest.raises(ValueError):
+        summary.specific_variances()
+    with pytest.raises(ValueError):
+        summary.specific_variances(halflife=10, ddof=0)
+    with pytest.raises(ValueError):
+        summary.specific_variances(weights=np.ones(10), halflife=10)
+
+    summary = FactorRiskModelSummary.from_risk_model(factor_risk_model_np).copy()
+    np.testing.assert_allclose(summary.cov(), factor_risk_model_np.cov())
+    np.testing.assert_allclose(
+        summary.specific_variances(), factor_risk_model_np.specific_variances()
+    )
+    np.testing.assert_allclose(summary.corr(), factor_risk_model_np.corr())
+
+
 def test_factor_risk_model_io_directory(factor_risk_model_pd):
     with TemporaryDirectory() as tmpdir:
         factor_risk_model_pd.write_directory(
@@ -138,3 +138,38 @@ def test_factor_risk_model_transform(daily_returns_np, factor_risk_model):
             ]
         ),
     )
+
+
+def test_factor_risk_model_transform_projection_cache(
+    daily_returns_np, factor_exposures, factor_returns, residual_returns
+):
+    from fpm_risk_model.regressor import WLS
+
+    model = FactorRiskModel(
+        factor_exposures=factor_exposures.copy(),
+        factor_returns=factor_returns.copy(),
+        residual_returns=residual_returns.copy(),
+    )
+    projection = model.projection()
+    assert projection is model.projection()
+
+    # Transform into two universes with the same projection operator
+    first_model = model.copy().transform(y=daily_returns_np[:, :2])
+    second_model = model.copy().transform(y=daily_returns_np[:, 2:])
+    assert first_model.projection() is projection
+    assert second_model.projection() is projection
+    expected = WLS().fit(X=factor_returns, y=daily_returns_np)
+    np.testing.assert_almost_equal(
+        np.hstack([first_model.factor_exposures, second_model.factor_exposures]),
+        expected.beta,
+    )
+    np.testing.assert_almost_equal(
+        np.hstack([first_model.residual_returns, second_model.residual_returns]),
+        expected.alpha,
+    )
+
+    # Invalidated by the weights and the factor returns
+    weights = np.linspace(0.5, 1.5, factor_returns.shape[0])
+    assert model.projection(weights=weights) is not projection
+    model._factor_returns = factor_returns * 2.0
+    np.testing.assert_almost_equal(model.projection(), projection / 2.0)
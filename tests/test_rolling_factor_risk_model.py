@@ -1,9 +1,13 @@
+from os.path import exists, join
+from shutil import rmtree
 from tempfile import TemporaryDirectory
 
+import numpy as np
 import pandas as pd
 import pytest
 from numpy import array
 
+from fpm_risk_model.engine import backend, use_backend
 from fpm_risk_model.rolling_factor_risk_model import RollingFactorRiskModel
 from fpm_risk_model.statistical import PCA
 
@@ -284,3 +288,533 @@ def test_rolling_factor_risk_model_io_directory(
             target_rolling_model.get(key).residual_returns,
             check_freq=False,
         )
+
+
+@pytest.mark.parametrize("executor", ["closed", "lstsq"])
+def test_rolling_factor_risk_model_transform_batch(
+    daily_returns, instruments, monkeypatch, executor
+):
+    from fpm_risk_model.regressor import WLS
+
+    y = daily_returns[["A", "AAL", "AAPL"]]
+    # The validity of all the instruments runs the regressions one by one
+    validity = pd.DataFrame(True, index=daily_returns.index, columns=y.columns)
+    expected_model = RollingFactorRiskModel(model=PCA(n_components=2), window=WINDOW)
+    expected_model.fit(X=daily_returns)
+    expected_model.transform(y=y, validity=validity, regressor=WLS(executor))
+
+    fit_batch = WLS.fit_batch
+    batch_sizes = []
+
+    def _fit_batch(self, X, y, weights=None):
+        batch_sizes.append(X.shape[0])
+        return fit_batch(self, X=X, y=y, weights=weights)
+
+    monkeypatch.setattr(WLS, "fit_batch", _fit_batch)
+    rolling_model = RollingFactorRiskModel(model=PCA(n_components=2), window=WINDOW)
+    rolling_model.fit(X=daily_returns)
+    rolling_model.transform(y=y, regressor=WLS(executor))
+    # The regressions of all the windows are stacked in one batch
+    assert batch_sizes == [len(expected_model.keys())]
+    _assert_rolling_models_equal(rolling_model, expected_model)
+
+
+def test_rolling_factor_risk_model_transform_many(daily_returns, instruments):
+    model = PCA(
+        n_components=2,
+        demean=True,
+        speedup=True,
+    )
+    validity = pd.DataFrame(True, index=daily_returns.index, columns=instruments)
+    validity.iloc[-2:, 0] = False
+    universes = {
+        "first": daily_returns[["A", "AAL", "AAPL"]],
+        "second": (daily_returns, validity),
+    }
+    rolling_model = RollingFactorRiskModel(model=model, window=WINDOW)
+    rolling_model.fit(X=daily_returns)
+    transformed_models = rolling_model.transform_many(universes)
+    assert set(transformed_models.keys()) == {"first", "second"}
+
+    for name, universe in universes.items():
+        y, validity = universe if isinstance(universe, tuple) else (universe, None)
+        expected_model = RollingFactorRiskModel(model=model, window=WINDOW)
+        expected_model.fit(X=daily_returns)
+        expected_model.transform(y=y, validity=validity)
+        assert list(transformed_models[name].keys()) == list(expected_model.keys())
+        for key, value in expected_model.items():
+            transformed_model = transformed_models[name].get(key)
+            pd.testing.assert_frame_equal(
+                transformed_model.factor_exposures, value.factor_exposures
+            )
+            pd.testing.assert_frame_equal(
+                transformed_model.residual_returns, value.residual_returns
+            )
+
+    # The estimation universe model is not modified
+    for key, value in rolling_model.items():
+        assert list(value.factor_exposures.columns) == instruments
+
+
+@pytest.mark.parametrize("memory_budget", [None, 1])
+def test_rolling_factor_risk_model_batch(
+    daily_returns,
+    expected_factor_exposures,
+    expected_factor_returns,
+    expected_residual_returns,
+    memory_budget,
+):
+    model = PCA(
+        n_components=2,
+        demean=True,
+        speedup=True,
+    )
+    rolling_model = RollingFactorRiskModel(
+        model=model,
+        window=WINDOW,
+        show_progress=False,
+    )
+    rolling_model.fit(X=daily_returns, batch=True, memory_budget=memory_budget)
+    assert list(rolling_model.keys()) == list(expected_factor_returns.keys())
+    for key, value in rolling_model.items():
+        pd.testing.assert_frame_equal(
+            value.factor_returns, expected_factor_returns[key]
+        )
+        pd.testing.assert_frame_equal(
+            value.factor_exposures, expected_factor_exposures[key]
+        )
+        pd.testing.assert_frame_equal(
+            value.residual_returns, expected_residual_returns[key]
+        )
+
+
+def test_rolling_factor_risk_model_fit_modes_signs():
+    # The factor signs must agree across the loop, warm start and batch fits
+    rng = np.random.default_rng(0)
+    factor_returns = rng.standard_normal((80, 2)) * np.array([0.05, 0.02])
+    returns = factor_returns @ rng.standard_normal((2, 30))
+    returns += rng.standard_normal((80, 30)) * 0.01
+    returns = pd.DataFrame(returns, index=pd.bdate_range("2020-01-01", periods=80))
+
+    expected_model = RollingFactorRiskModel(model=PCA(n_components=2), window=40)
+    expected_model.fit(X=returns)
+    expected_values = dict(expected_model.items())
+    warm_start_model = RollingFactorRiskModel(
+        model=PCA(n_components=2, warm_start=True, warm_start_tol=1e-12),
+        window=40,
+    )
+    warm_start_model.fit(X=returns)
+    batch_model = RollingFactorRiskModel(model=PCA(n_components=2), window=40)
+    batch_model.fit(X=returns, batch=True)
+
+    for rolling_model in [warm_start_model, batch_model]:
+        assert list(rolling_model.keys()) == list(expected_model.keys())
+        for key, value in rolling_model.items():
+            pd.testing.assert_frame_equal(
+                value.factor_exposures,
+                expected_values[key].factor_exposures,
+                atol=1e-6,
+            )
+            pd.testing.assert_frame_equal(
+                value.factor_returns,
+                expected_values[key].factor_returns,
+                atol=1e-6,
+            )
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_rolling_factor_risk_model_workers(
+    daily_returns,
+    expected_factor_exposures,
+    expected_factor_returns,
+    expected_residual_returns,
+    executor,
+):
+    model = PCA(
+        n_components=2,
+        demean=True,
+        speedup=True,
+    )
+    rolling_model = RollingFactorRiskModel(
+        model=model,
+        window=WINDOW,
+        show_progress=False,
+    )
+    rolling_model.fit(X=daily_returns, workers=2, executor=executor)
+    assert list(rolling_model.keys()) == list(expected_factor_returns.keys())
+    for key, value in rolling_model.items():
+        pd.testing.assert_frame_equal(
+            value.factor_returns, expected_factor_returns[key]
+        )
+        pd.testing.assert_frame_equal(
+            value.factor_exposures, expected_factor_exposures[key]
+        )
+        pd.testing.assert_frame_equal(
+            value.residual_returns, expected_residual_returns[key]
+        )
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_rolling_factor_risk_model_workers_warm_start(daily_returns, executor):
+    # Each window in the workers is fitted from the model as given, so
+    # the warm start does not depend on the number of workers
+    expected_model = RollingFactorRiskModel(model=PCA(n_components=2), window=WINDOW)
+    expected_model.fit(X=daily_returns)
+    for workers in [2, 3]:
+        rolling_model = RollingFactorRiskModel(
+            model=PCA(n_components=2, warm_start=True), window=WINDOW
+        )
+        rolling_model.fit(X=daily_returns, workers=workers, executor=executor)
+        _assert_rolling_models_equal(rolling_model, expected_model)
+
+
+class _NumpyOnlyPCA(PCA):
+    """
+    PCA failing the fit in any backend engine other than NumPy.
+    """
+
+    def fit(self, X, weights=None):
+        if backend() != "numpy":
+            raise ValueError(f"Cannot fit in backend engine {backend()}")
+        return super().fit(X=X, weights=weights)
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_rolling_factor_risk_model_workers_backend(daily_returns, executor):
+    rolling_model = RollingFactorRiskModel(
+        model=_NumpyOnlyPCA(n_components=2), window=WINDOW
+    )
+    rolling_model.fit(X=daily_returns, workers=2, executor=executor)
+    # The workers run in the backend engine of the caller context
+    with use_backend("jax"):
+        with pytest.raises(RuntimeError, match="backend engine jax"):
+            rolling_model.fit(X=daily_returns, workers=2, executor=executor)
+
+
+def test_rolling_factor_risk_model_workers_invalid(daily_returns):
+    rolling_model = RollingFactorRiskModel(model=PCA(n_components=2), window=WINDOW)
+    with pytest.raises(ValueError):
+        rolling_model.fit(X=daily_returns, workers=2, executor="unknown")
+    with pytest.raises(ValueError):
+        rolling_model.fit(X=daily_returns, workers=2, batch=True)
+
+
+def test_rolling_factor_risk_model_update(daily_returns, instruments):
+    validity = pd.DataFrame(True, index=daily_returns.index, columns=instruments)
+    validity.iloc[-1, 0] = False
+    y = daily_returns[["A", "AAL", "AAPL"]]
+
+    expected_model = RollingFactorRiskModel(model=PCA(n_components=2), window=WINDOW)
+    expected_model.fit(X=daily_returns, validity=validity).transform(y=y)
+
+    rolling_model = RollingFactorRiskModel(model=PCA(n_components=2), window=WINDOW)
+    rolling_model.fit(X=daily_returns.iloc[:-2], validity=validity).transform(y=y)
+    fitted_models = dict(rolling_model.items())
+    rolling_model.update(X=daily_returns, validity=validity, y=y)
+
+    assert list(rolling_model.keys()) == list(expected_model.keys())
+    for key, value in rolling_model.items():
+        expected_value = expected_model.get(key)
+        pd.testing.assert_frame_equal(
+            value.factor_exposures, expected_value.factor_exposures
+        )
+        pd.testing.assert_frame_equal(
+            value.residual_returns, expected_value.residual_returns
+        )
+        # The existing dates are not refitted
+        if key in fitted_models:
+            assert value is fitted_models[key]
+
+    # No new date is a no-op
+    values = dict(rolling_model.items())
+    rolling_model.update(X=daily_returns, validity=validity, y=y)
+    assert dict(rolling_model.items()) == values
+
+
+def test_rolling_factor_risk_model_checkpoint(daily_returns, expected_factor_exposures):
+    model = PCA(n_components=2)
+    with TemporaryDirectory() as tmpdir:
+        rolling_model = RollingFactorRiskModel(model=model, window=WINDOW)
+        rolling_model.fit(X=daily_returns, checkpoint_dir=tmpdir)
+        assert list(rolling_model.keys()) == list(expected_factor_exposures.keys())
+        for key, value in rolling_model.items():
+            pd.testing.assert_frame_equal(
+                value.factor_exposures, expected_factor_exposures[key]
+            )
+
+        # Resume the fit with the last checkpoint missing
+        keys = list(rolling_model.keys())
+        rmtree(join(tmpdir, keys[-1].isoformat()))
+        fitted_inputs = []
+        fit = model.fit
+
+        def _fit(X, **kwargs):
+            fitted_inputs.append(X)
+            return fit(X, **kwargs)
+
+        model.fit = _fit
+        rolling_model = RollingFactorRiskModel(model=model, window=WINDOW)
+        rolling_model.fit(X=daily_returns, checkpoint_dir=tmpdir)
+        assert len(fitted_inputs) == 1
+        assert fitted_inputs[0].index[-1] == keys[-1]
+        assert list(rolling_model.keys()) == keys
+
+        read_model = RollingFactorRiskModel.read_directory(tmpdir)
+        pd.testing.assert_frame_equal(
+            read_model.get(keys[-1]).factor_exposures,
+            expected_factor_exposures[keys[-1]],
+        )
+
+
+def test_rolling_factor_risk_model_window_views(daily_returns):
+    model = PCA(n_components=2)
+    fitted_inputs = []
+    fit = model.fit
+
+    def _fit(X, **kwargs):
+        fitted_inputs.append(X)
+        return fit(X, **kwargs)
+
+    model.fit = _fit
+    RollingFactorRiskModel(model=model, window=WINDOW).fit(X=daily_returns)
+    # All the windows are views of the same filled returns
+    assert len(fitted_inputs) > 1
+    for previous_input, fitted_input in zip(fitted_inputs[:-1], fitted_inputs[1:]):
+        assert np.shares_memory(previous_input.values, fitted_input.values)
+
+
+def test_rolling_factor_risk_model_checkpoint_update(
+    daily_returns, expected_factor_exposures, monkeypatch
+):
+    from fpm_risk_model.factor_risk_model import FactorRiskModel
+
+    with TemporaryDirectory() as tmpdir:
+        rolling_model = RollingFactorRiskModel(model=PCA(n_components=2), window=WINDOW)
+        rolling_model.fit(X=daily_returns.iloc[:-1], checkpoint_dir=tmpdir)
+        keys = list(expected_factor_exposures.keys())
+        assert not exists(join(tmpdir, keys[-1].isoformat()))
+
+        # The existing checkpoints are not read in the update
+        read_directory = FactorRiskModel.read_directory
+        read_paths = []
+
+        def _read_directory(path, **kwargs):
+            read_paths.append(path)
+            return read_directory(path, **kwargs)
+
+        monkeypatch.setattr(FactorRiskModel, "read_directory", _read_directory)
+        rolling_model.update(X=daily_returns)
+        assert read_paths == []
+        assert exists(join(tmpdir, keys[-1].isoformat(), "metadata.json"))
+        assert list(rolling_model.keys()) == keys
+        pd.testing.assert_frame_equal(
+            rolling_model.get(keys[-1]).factor_exposures,
+            expected_factor_exposures[keys[-1]],
+        )
+
+        # The new date is resumed from the directory
+        resumed_model = RollingFactorRiskModel(model=PCA(n_components=2), window=WINDOW)
+        resumed_model.fit(X=daily_returns, checkpoint_dir=tmpdir)
+        assert len(read_paths) == 1
+        assert list(resumed_model.keys()) == keys
+        assert list(RollingFactorRiskModel.read_directory(tmpdir).keys()) == keys
+
+
+def test_rolling_factor_risk_model_checkpoint_transform(daily_returns):
+    from fpm_risk_model.rolling_factor_risk_model import _DirectoryValues
+
+    y = daily_returns[["A", "AAL", "AAPL"]]
+    expected_model = RollingFactorRiskModel(model=PCA(n_components=2), window=WINDOW)
+    expected_model.fit(X=daily_returns)
+    keys = list(expected_model.keys())
+    expected_model.transform(y=y, start_date=keys[1])
+
+    with TemporaryDirectory() as tmpdir:
+        rolling_model = RollingFactorRiskModel(model=PCA(n_components=2), window=WINDOW)
+        rolling_model.fit(X=daily_returns, checkpoint_dir=tmpdir)
+        rolling_model.transform(y=y, start_date=keys[1])
+        # The transformed risk models are written back to the directory
+        assert isinstance(rolling_model._values, _DirectoryValues)
+        assert not exists(join(tmpdir, keys[0].isoformat()))
+        read_model = RollingFactorRiskModel.read_directory(tmpdir)
+        for model in [rolling_model, read_model]:
+            assert list(model.keys()) == list(expected_model.keys())
+            for key, value in model.items():
+                expected_value = expected_model.get(key)
+                pd.testing.assert_frame_equal(
+                    value.factor_exposures, expected_value.factor_exposures
+                )
+                pd.testing.assert_frame_equal(
+                    value.residual_returns,
+                    expected_value.residual_returns,
+                    check_freq=False,
+                )
+
+
+def _assert_rolling_models_equal(rolling_model, expected_model):
+    assert list(rolling_model.keys()) == list(expected_model.keys())
+    for key, value in rolling_model.items():
+        expected_value = expected_model.get(key)
+        pd.testing.assert_frame_equal(
+            value.factor_exposures, expected_value.factor_exposures
+        )
+        pd.testing.assert_frame_equal(
+            value.residual_returns, expected_value.residual_returns
+        )
+        pd.testing.assert_frame_equal(
+            rolling_model.get(key).cov(), expected_value.cov()
+        )
+
+
+def test_rolling_factor_risk_model_retain_compact(daily_returns, instruments):
+    validity = pd.DataFrame(True, index=daily_returns.index, columns=instruments)
+    validity.iloc[-1, 0] = False
+    y = daily_returns[["A", "AAL", "AAPL"]]
+
+    expected_model = RollingFactorRiskModel(model=PCA(n_components=2), window=WINDOW)
+    expected_model.fit(X=daily_returns, validity=validity)
+    rolling_model = RollingFactorRiskModel(model=PCA(n_components=2), window=WINDOW)
+    rolling_model.fit(X=daily_returns, validity=validity, retain="compact")
+
+    # Only the factor exposures and returns are kept for each date
+    assert all(
+        value.residual_returns is None
+        for value in rolling_model._values.compact_values.values()
+    )
+    # The transform modifies the models in place, so the untransformed
+    # models, of which the offsets are not zero, are checked first
+    _assert_rolling_models_equal(rolling_model, expected_model)
+    rolling_model.transform(y=y, retain="compact")
+    expected_model.transform(y=y)
+    _assert_rolling_models_equal(rolling_model, expected_model)
+
+    with pytest.raises(ValueError):
+        rolling_model.fit(X=daily_returns, retain="unknown")
+
+
+@pytest.mark.parametrize("transform", [False, True])
+def test_rolling_factor_risk_model_retain_compact_update(
+    daily_returns, instruments, transform
+):
+    validity = pd.DataFrame(True, index=daily_returns.index, columns=instruments)
+    validity.iloc[-1, 0] = False
+    y = daily_returns[["A", "AAL", "AAPL"]] if transform else None
+
+    expected_model = RollingFactorRiskModel(model=PCA(n_components=2), window=WINDOW)
+    expected_model.fit(X=daily_returns, validity=validity)
+    rolling_model = RollingFactorRiskModel(model=PCA(n_components=2), window=WINDOW)
+    rolling_model.fit(X=daily_returns.iloc[:-2], validity=validity, retain="compact")
+    if transform:
+        expected_model.transform(y=y)
+        rolling_model.transform(y=y, retain="compact")
+
+    rolling_model.update(X=daily_returns, validity=validity, y=y)
+    # The new dates are appended in the compact form
+    assert all(
+        value.residual_returns is None
+        for value in rolling_model._values.compact_values.values()
+    )
+    _assert_rolling_models_equal(rolling_model, expected_model)
+
+
+@pytest.mark.parametrize("cov_halflife", [None, 3])
+def test_rolling_factor_risk_model_retain_summary(
+    daily_returns, instruments, cov_halflife
+):
+    validity = pd.DataFrame(True, index=daily_returns.index, columns=instruments)
+    validity.iloc[-1, 0] = False
+    y = daily_returns[["A", "AAL", "AAPL"]]
+
+    expected_model = RollingFactorRiskModel(model=PCA(n_components=2), window=WINDOW)
+    expected_model.fit(X=daily_returns, validity=validity)
+    rolling_model = RollingFactorRiskModel(model=PCA(n_components=2), window=WINDOW)
+    rolling_model.fit(
+        X=daily_returns,
+        validity=validity,
+        retain="summary",
+        cov_halflife=cov_halflife,
+    )
+
+    transformed_model = RollingFactorRiskModel(model=PCA(n_components=2), window=WINDOW)
+    transformed_model.fit(X=daily_returns, validity=validity)
+    transformed_model.transform(y=y, retain="summary", cov_halflife=cov_halflife)
+    expected_transformed_model = RollingFactorRiskModel(
+        model=PCA(n_components=2), window=WINDOW
+    )
+    expected_transformed_model.fit(X=daily_returns, validity=validity)
+    expected_transformed_model.transform(y=y)
+
+    for rolling_model, expected_model in [
+        (rolling_model, expected_model),
+        (transformed_model, expected_transformed_model),
+    ]:
+        assert list(rolling_model.keys()) == list(expected_model.keys())
+        for key, value in rolling_model.items():
+            # Only the covariance components are kept for each date
+            assert value.factor_returns is None
+            assert value.residual_returns is None
+            expected_value = expected_model.get(key)
+            pd.testing.assert_frame_equal(
+                value.cov(halflife=cov_halflife),
+                expected_value.cov(halflife=cov_halflife),
+            )
+            pd.testing.assert_frame_equal(
+                value.corr(halflife=cov_halflife),
+                expected_value.corr(halflife=cov_halflife),
+            )
+            pd.testing.assert_series_equal(
+                value.vol(halflife=cov_halflife),
+                expected_value.vol(halflife=cov_halflife),
+            )
+
+    with pytest.raises(ValueError):
+        value.cov(halflife=10)
+    with pytest.raises(NotImplementedError):
+        value.transform(y=y)
+    with TemporaryDirectory() as tmpdir:
+        with pytest.raises(NotImplementedError):
+            value.write_directory(tmpdir)
+
+
+@pytest.mark.parametrize("transform", [False, True])
+def test_rolling_factor_risk_model_retain_summary_update(
+    daily_returns, instruments, transform
+):
+    from fpm_risk_model.factor_risk_model_summary import FactorRiskModelSummary
+
+    validity = pd.DataFrame(True, index=daily_returns.index, columns=instruments)
+    validity.iloc[-1, 0] = False
+    y = daily_returns[["A", "AAL", "AAPL"]] if transform else None
+
+    expected_model = RollingFactorRiskModel(model=PCA(n_components=2), window=WINDOW)
+    expected_model.fit(X=daily_returns, validity=validity)
+    rolling_model = RollingFactorRiskModel(model=PCA(n_components=2), window=WINDOW)
+    if transform:
+        expected_model.transform(y=y)
+        rolling_model.fit(X=daily_returns.iloc[:-2], validity=validity)
+        rolling_model.transform(y=y, retain="summary", cov_halflife=3)
+    else:
+        rolling_model.fit(
+            X=daily_returns.iloc[:-2],
+            validity=validity,
+            retain="summary",
+            cov_halflife=3,
+        )
+
+    rolling_model.update(X=daily_returns, validity=validity, y=y)
+    assert list(rolling_model.keys()) == list(expected_model.keys())
+    for key, value in rolling_model.items():
+        # The new dates are summarized with the same halflife
+        assert isinstance(value, FactorRiskModelSummary)
+        assert value.halflife == 3
+        pd.testing.assert_frame_equal(
+            value.cov(halflife=3), expected_model.get(key).cov(halflife=3)
+        )
+
+    # The specific variances of the summary cannot be modified
+    value = FactorRiskModelSummary.from_risk_model(expected_model.get(key))
+    specific_variances = value.specific_variances()
+    specific_variances.iloc[0] = -1.0
+    pd.testing.assert_series_equal(
+        value.specific_variances(), expected_model.get(key).specific_variances()
+    )